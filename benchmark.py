@@ -0,0 +1,305 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from itertools import accumulate
+import config
+import vectorized
+from process import process_input_query
+from utils import close_operation_log
+
+'''
+Benchmark of every operation on generated sales tables
+Tables R (the given number of rows) and S (a tenth of them, with sale ids taken from R) are generated for every scale,
+then every operation is timed with the given execution modes, once without indexes and once after creating hash and
+B-tree indexes, and the results are written as JSON so that runs of different commits can be compared
+'''
+
+'''
+Attributes of the generated tables (same schema as sales1.txt)
+'''
+SALES_HEADER = ["saleid", "itemid", "customerid", "storeid", "time", "qty", "pricerange"]
+
+'''
+Values of the pricerange attribute
+'''
+PRICE_RANGES = ["supercheap", "cheap", "moderate", "expensive", "outrageous"]
+
+'''
+Number of rows written to a generated file at a time
+'''
+GENERATE_BATCH_SIZE = 100000
+
+'''
+Queries preparing the tables of a benchmark, {R}/{S} are replaced by the generated files
+'''
+SETUP_QUERIES = [
+    ("inputfromfile_R", "R := inputfromfile({R})"),
+    ("inputfromfile_S", "S := inputfromfile({S})"),
+    ("select_Rs", "Rs := select(R, saleid < 300)"),
+    ("select_Ss", "Ss := select(S, saleid < 300)"),
+]
+
+'''
+Queries creating the indexes of the indexed benchmark
+'''
+INDEX_QUERIES = [
+    ("Hash_R_itemid", "Hash(R, itemid)"),
+    ("Hash_R_customerid", "Hash(R, customerid)"),
+    ("Btree_R_time", "Btree(R, time)"),
+    ("Btree_R_saleid", "Btree(R, saleid)"),
+    ("Hash_S_saleid", "Hash(S, saleid)"),
+]
+
+'''
+Benchmarked queries: (name, query), {out} is replaced by a file name inside the data directory
+'''
+BENCHMARK_QUERIES = [
+    ("select_equal", "A := select(R, itemid = 7)"),
+    ("select_range", "A := select(R, (time > 50) and (time <= 60))"),
+    ("select_or", "A := select(R, (itemid = 7) or (customerid = 11))"),
+    ("select_arithmetic", "A := select(R, qty*2 > 60)"),
+    ("project", "A := project(R, saleid, qty, pricerange)"),
+    ("sum", "A := sum(R, qty)"),
+    ("avg", "A := avg(R, qty)"),
+    ("sumgroup", "A := sumgroup(R, qty, storeid)"),
+    ("avggroup", "A := avggroup(R, qty, storeid, pricerange)"),
+    ("count", "A := count(R)"),
+    ("countgroup", "A := countgroup(R, qty, pricerange)"),
+    ("movsum", "A := movsum(R, qty, 10)"),
+    ("movavg", "A := movavg(R, qty, 10)"),
+    ("movmin", "A := movmin(R, qty, 10)"),
+    ("movmax", "A := movmax(R, qty, 10)"),
+    ("movcount", "A := movcount(R, qty, 10)"),
+    ("cumsum", "A := cumsum(R, qty)"),
+    ("sort", "A := sort(R, storeid, qty)"),
+    ("topk", "A := topk(R, 100, qty desc, storeid)"),
+    ("concat", "A := concat(R, R)"),
+    ("join_equal", "A := join(R, S, R.saleid = S.saleid)"),
+    ("join_and", "A := join(R, S, (R.saleid = S.saleid) and (R.qty > S.qty))"),
+    ("join_band", "A := join(Rs, Ss, Rs.qty < Ss.qty)"),
+    ("outputtofile", "outputtofile(R, {out})"),
+    ("savetable", "savetable(R, {out})"),
+    ("loadtable", "A := loadtable({out})"),
+]
+
+'''
+Method which draws values from 1 to cardinality, value k being drawn with a weight of 1 / k^skew (0 is uniform)
+Parameters: rng - random number generator
+            count - number of values
+            cardinality - number of distinct values
+            skew - exponent of the Zipf distribution
+Return: list of values
+'''
+def draw_keys(rng, count, cardinality, skew):
+    if skew == 0:
+        return [rng.randint(1, cardinality) for _ in range(count)]
+    cum_weights = list(accumulate(1 / k ** skew for k in range(1, cardinality + 1)))
+    return rng.choices(range(1, cardinality + 1), cum_weights=cum_weights, k=count)
+
+'''
+Method which writes a generated sales table to a file
+Parameters: file_name - name of the file (without the .txt extension)
+            sale_ids - sale ids of the rows
+            cardinality - number of distinct item ids (customer ids have ten times more)
+            skew - exponent of the Zipf distribution of item and customer ids
+            rng - random number generator
+Result: create the file in the format read by inputfromfile
+'''
+def write_sales_file(file_name, sale_ids, cardinality, skew, rng):
+    with open("{0}.txt".format(file_name), "w") as f:
+        f.write("|".join(SALES_HEADER) + "\n")
+        for start in range(0, len(sale_ids), GENERATE_BATCH_SIZE):
+            batch = sale_ids[start:start + GENERATE_BATCH_SIZE]
+            count = len(batch)
+            columns = [
+                batch,
+                draw_keys(rng, count, cardinality, skew),
+                draw_keys(rng, count, cardinality * 10, skew),
+                [rng.randint(1, 100) for _ in range(count)],
+                [rng.randint(1, 100) for _ in range(count)],
+                [rng.randint(1, 50) for _ in range(count)],
+                [rng.choice(PRICE_RANGES) for _ in range(count)],
+            ]
+            f.write("".join("|".join(map(str, record)) + "\n" for record in zip(*columns)))
+
+'''
+Method which generates the tables R and S of a scale, unless they already exist
+Parameters: data_dir - directory of the generated files
+            num_rows - number of rows of R
+            cardinality - number of distinct item ids
+            skew - exponent of the Zipf distribution of item and customer ids
+            seed - seed of the random number generator
+Return: dictionary with the names of the files of R and S (without the .txt extension)
+'''
+def generate_tables(data_dir, num_rows, cardinality, skew, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    suffix = "{0}_c{1}_s{2}_r{3}".format(num_rows, cardinality, skew, seed)
+    files = {"R": os.path.join(data_dir, "R_" + suffix), "S": os.path.join(data_dir, "S_" + suffix)}
+    if not all(os.path.exists("{0}.txt".format(file_name)) for file_name in files.values()):
+        rng = random.Random(seed)
+        write_sales_file(files["R"], list(range(1, num_rows + 1)), cardinality, skew, rng)
+        write_sales_file(files["S"], sorted(rng.sample(range(1, num_rows + 1), max(num_rows // 10, 1))), cardinality, skew, rng)
+    return files
+
+'''
+Method which times a query
+Parameters: query - input query
+            tables - a dictionary that stores all the created tables
+Return: execution time in seconds
+'''
+def time_query(query, tables):
+    start_time = time.perf_counter()
+    process_input_query(query, tables)
+    return time.perf_counter() - start_time
+
+'''
+Method which times the conversion of a table to text
+Parameters: table - table
+            file_name - file written by outputtofile
+            repeat - number of runs
+Return: list of (name, times of every run)
+'''
+def time_serialization(table, file_name, repeat):
+    runs = {"serialize_str": [], "serialize_write_lines": [], "serialize_output_to_file": []}
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        str(table)
+        runs["serialize_str"].append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        table.write_lines(io.StringIO())
+        runs["serialize_write_lines"].append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        table.output_to_file(file_name)
+        runs["serialize_output_to_file"].append(time.perf_counter() - start_time)
+    return list(runs.items())
+
+'''
+Method which builds the result of a benchmarked operation
+Parameters: scale, mode, indexed - settings of the benchmark
+            name - name of the operation
+            query - benchmarked query
+            times - execution times of every run
+            rows_in, rows_out - number of rows of the input and result tables
+Return: dictionary written to the JSON results
+'''
+def make_result(scale, mode, indexed, name, query, times, rows_in, rows_out):
+    best = min(times)
+    return {
+        "scale": scale, "mode": mode, "indexes": indexed, "operation": name, "query": query,
+        "seconds": best, "median_seconds": statistics.median(times), "runs": len(times),
+        "rows_in": rows_in, "rows_out": rows_out, "rows_per_second": rows_in / best if best > 0 else None,
+    }
+
+'''
+Method which runs the benchmark of one scale and execution mode
+Parameters: files - names of the generated files of R and S
+            data_dir - directory of the files created by the benchmarked queries
+            scale - number of rows of R
+            mode - execution mode ("python" or "numpy")
+            indexed - whether the indexes are created before the benchmarked queries
+            repeat - number of runs of every query
+Return: list of results
+'''
+def run_benchmark(files, data_dir, scale, mode, indexed, repeat):
+    config.EXECUTION_MODE = mode
+    results = []
+    tables = {}
+    for name, query in SETUP_QUERIES:
+        query = query.format(**files)
+        execution_time = time_query(query, tables)
+        rows = len(tables[query.split(":=")[0].strip()])
+        results.append(make_result(scale, mode, indexed, name, query, [execution_time], rows, rows))
+    if indexed:
+        for name, query in INDEX_QUERIES:
+            rows = len(tables[name.split("_")[1]])
+            results.append(make_result(scale, mode, indexed, name, query, [time_query(query, tables)], rows, rows))
+    out = os.path.join(data_dir, "out_{0}".format(scale))
+    for name, query in BENCHMARK_QUERIES:
+        query = query.format(out=out)
+        times = [time_query(query, tables) for _ in range(repeat)]
+        rows_out = len(tables["A"]) if ":=" in query else len(tables["R"])
+        rows_in = len(tables["Rs"]) * len(tables["Ss"]) if name == "join_band" else len(tables["R"])
+        results.append(make_result(scale, mode, indexed, name, query, times, rows_in, rows_out))
+        tables.pop("A", None)
+    for name, times in time_serialization(tables["R"], out, repeat):
+        results.append(make_result(scale, mode, indexed, name, "R", times, len(tables["R"]), len(tables["R"])))
+    return results
+
+'''
+Method which finds the commit of the current source tree
+Return: commit hash, None outside of a git repository
+'''
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+'''
+Method which compares the results of two benchmark runs
+Parameters: old_file_name, new_file_name - JSON results of the runs
+Result: print the time of every operation in both runs and their ratio
+'''
+def compare_results(old_file_name, new_file_name):
+    with open(old_file_name) as f:
+        old_run = json.load(f)
+    with open(new_file_name) as f:
+        new_run = json.load(f)
+    old_times = {(r["scale"], r["mode"], r["indexes"], r["operation"]): r["seconds"] for r in old_run["results"]}
+    print("{0:>10} {1:>7} {2:>7} {3:<26} {4:>12} {5:>12} {6:>7}".format("scale", "mode", "indexes", "operation", "old (s)", "new (s)", "ratio"))
+    for r in new_run["results"]:
+        key = (r["scale"], r["mode"], r["indexes"], r["operation"])
+        if key not in old_times:
+            continue
+        ratio = r["seconds"] / old_times[key] if old_times[key] > 0 else float("inf")
+        print("{0:>10} {1:>7} {2:>7} {3:<26} {4:>12.6f} {5:>12.6f} {6:>7.2f}".format(r["scale"], r["mode"], str(r["indexes"]), r["operation"], old_times[key], r["seconds"], ratio))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every operation on generated sales tables")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000], help="numbers of rows of the generated table R (default: 10000)")
+    parser.add_argument("--modes", nargs="+", choices=["python", "numpy"], default=["python"], help="execution modes to benchmark")
+    parser.add_argument("--cardinality", type=int, default=1000, help="number of distinct item ids (customer ids have ten times more)")
+    parser.add_argument("--skew", type=float, default=0, help="Zipf exponent of item and customer ids (0 is uniform)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the data generator")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of every operation (the fastest is reported)")
+    parser.add_argument("--data-dir", default="benchmark_data", help="directory of the generated and written files")
+    parser.add_argument("--output", default="benchmark_results.json", help="file receiving the JSON results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two JSON results instead of running the benchmark")
+    args = parser.parse_args()
+    if args.compare:
+        compare_results(*args.compare)
+        raise SystemExit
+    if "numpy" in args.modes and vectorized.np is None:
+        parser.error("NumPy is required for --modes numpy")
+    if args.repeat < 1 or args.cardinality < 1 or min(args.scales) < 1:
+        parser.error("--repeat, --cardinality and --scales must be at least 1")
+
+    # Results are not logged to AllOperations.txt, only the operations are timed
+    config.LOG_MODE = "off"
+    results = []
+    for scale in args.scales:
+        start_time = time.perf_counter()
+        files = generate_tables(args.data_dir, scale, args.cardinality, args.skew, args.seed)
+        print("Generated {0} rows in {1:.2f} sec".format(scale, time.perf_counter() - start_time))
+        for mode in args.modes:
+            for indexed in (False, True):
+                for result in run_benchmark(files, args.data_dir, scale, mode, indexed, args.repeat):
+                    results.append(result)
+                    print("{0:>10} {1:>7} {2:<8} {3:<26} {4:.6f} sec".format(scale, mode, "indexed" if indexed else "", result["operation"], result["seconds"]))
+    close_operation_log()
+    run = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {"cardinality": args.cardinality, "skew": args.skew, "seed": args.seed, "repeat": args.repeat},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print("Results written to", args.output)
@@ -0,0 +1,211 @@
+import os
+import re
+import sys
+from array import array
+from collections import OrderedDict
+import config
+import encoding
+from table import table_versions
+
+'''
+Cache of operation results, used when config.CACHE_MEMORY_BUDGET is greater than 0
+Results are keyed by the normalized operation and the versions of its input tables, so a result is only reused while
+its input tables are unchanged. Versions describe the content of tables: a table loaded from an unchanged file, or the
+result of a cached operation, gets the same version every time, while redefining or re-indexing a table changes it
+Least recently used results are evicted when the estimated size of the cached tables exceeds the memory budget, and
+results computed from a table version are dropped when no table has that version anymore
+The cache is kept in memory by the process running the query file, so results are only reused within one run
+'''
+
+'''
+Operations whose results are cached (operations reading files or changing tables are always executed)
+'''
+CACHED_OPERATIONS = ("select", "join", "project", "sum", "avg", "sumgroup", "avggroup", "count", "countgroup",
+                     "movsum", "movavg", "movmin", "movmax", "movcount", "cumsum", "sort", "topk", "concat")
+
+'''
+Cached results: key -> (result table, estimated size in bytes), in order of last use
+'''
+entries = OrderedDict()
+
+'''
+Keys of the cached results computed from every table version
+'''
+version_keys = {}
+
+'''
+Estimated size of the cached results in bytes
+'''
+cached_size = 0
+
+'''
+Hit/miss statistics of the cache
+'''
+stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+'''
+Method which checks whether the result cache is used
+Return: boolean value
+'''
+def enabled():
+    return config.CACHE_MEMORY_BUDGET > 0
+
+'''
+Method which normalizes a parameter of an operation, so that differently spaced queries share their results
+Parameters: param - parameter of the operation
+Return: tuple of tokens (string constants, names/numbers and single symbols)
+'''
+def normalize_param(param):
+    return tuple(re.findall(r"'[^']*'|\w+|[^\w\s]", param))
+
+'''
+Method which builds the cache key of an operation
+Parameters: op_name - name of the operation
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Return: hashable key, None if the result of the operation is not cached
+'''
+def make_key(op_name, params, tables):
+    if op_name not in CACHED_OPERATIONS:
+        return None
+    input_names = params[:2] if op_name in ("join", "concat") else params[:1]
+    if not all(name in tables for name in input_names):
+        return None
+    return op_name, tuple(normalize_param(param) for param in params), tuple(tables[name].version for name in input_names)
+
+'''
+Versions derived from the content they describe: description -> version
+'''
+derived_versions = {}
+
+'''
+Method which finds the version of a table from the description of its content, so that tables with the same
+content (e.g the same operation on the same input tables, or the same unchanged file) get the same version
+Parameters: description - hashable description of the content of the table
+Return: version number
+'''
+def derive_version(description):
+    version = derived_versions.get(description)
+    if version is None:
+        version = derived_versions[description] = next(table_versions)
+    return version
+
+'''
+Method which finds the version of the table created by an operation
+Parameters: op_name - name of the operation
+            params - parameters of the operation
+            cache_key - cache key of the operation (None if its result is not cached)
+Return: version number, None if the content of the table cannot be described (it keeps its own version)
+'''
+def result_version(op_name, params, cache_key):
+    if cache_key is not None:
+        return derive_version(cache_key)
+    if op_name in ("inputfromfile", "loadtable"):
+        # Tables loaded from the same unchanged file have the same content
+        file_name = "{0}.{1}".format(params[0], "txt" if op_name == "inputfromfile" else "tbl")
+        try:
+            file_stat = os.stat(file_name)
+        except OSError:
+            return None
+        return derive_version((op_name, os.path.abspath(file_name), file_stat.st_mtime_ns, file_stat.st_size))
+    return None
+
+'''
+Method which estimates the memory used by a table
+Parameters: table - table
+Return: estimated size in bytes
+'''
+def estimate_table_size(table):
+    base_table, row_ids, attr_indices = table.view_parts()
+    if row_ids is not None:
+        # Views only hold the positions of their rows inside their base table
+        return 8 * len(row_ids)
+    size = 0
+    for column in table.columns:
+        if isinstance(column, array):
+            size += column.itemsize * len(column)
+        elif isinstance(column, encoding.EncodedColumn):
+            size += column.codes.itemsize * len(column) + sum(map(sys.getsizeof, column.values))
+        elif column:
+            # Values of list columns are estimated from the first ones
+            sample = column[:100]
+            size += sys.getsizeof(column) + sum(map(sys.getsizeof, sample)) * len(column) // len(sample)
+    return size
+
+'''
+Method which finds a cached result
+Parameters: key - cache key of the operation
+Return: the result table, None if it is not cached
+'''
+def lookup(key):
+    entry = entries.get(key)
+    if entry is None:
+        stats["misses"] += 1
+        return None
+    stats["hits"] += 1
+    entries.move_to_end(key)
+    return entry[0]
+
+'''
+Method which caches the result of an operation, evicting the least recently used results if needed
+Parameters: key - cache key of the operation
+            result_table - table containing the operation result
+'''
+def store(key, result_table):
+    global cached_size
+    size = estimate_table_size(result_table)
+    if size > config.CACHE_MEMORY_BUDGET:
+        return
+    remove(key)
+    entries[key] = (result_table, size)
+    cached_size += size
+    for version in key[2]:
+        version_keys.setdefault(version, set()).add(key)
+    while cached_size > config.CACHE_MEMORY_BUDGET:
+        remove(next(iter(entries)))
+        stats["evictions"] += 1
+
+'''
+Method which removes a cached result
+Parameters: key - cache key of the operation
+'''
+def remove(key):
+    global cached_size
+    entry = entries.pop(key, None)
+    if entry is None:
+        return
+    cached_size -= entry[1]
+    for version in key[2]:
+        keys = version_keys.get(version)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del version_keys[version]
+
+'''
+Method which drops the cached results computed from a table version (the table was redefined or re-indexed)
+Parameters: version - version of the table
+'''
+def invalidate(version):
+    for key in list(version_keys.get(version, ())):
+        remove(key)
+        stats["invalidations"] += 1
+
+'''
+Method which drops the cached results computed from a table version that no table has anymore
+Parameters: version - version of the replaced or re-indexed table
+            tables - a dictionary that stores all the created tables
+'''
+def release_version(version, tables):
+    if all(table.version != version for table in tables.values()):
+        invalidate(version)
+
+'''
+Method which formats the statistics of the cache
+Return: text with the numbers of hits, misses, evictions and invalidations and the size of the cached results
+'''
+def format_stats():
+    lookups = stats["hits"] + stats["misses"]
+    return "Result Cache: {0} hits, {1} misses ({2:.1f}% hit rate), {3} evictions, {4} invalidations, {5} results using {6:.1f} MB".format(
+        stats["hits"], stats["misses"], 100 * stats["hits"] / lookups if lookups else 0, stats["evictions"],
+        stats["invalidations"], len(entries), cached_size / (1 << 20))
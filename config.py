@@ -0,0 +1,32 @@
+'''
+Settings of the current run, set from the command line options of main.py
+'''
+
+# Execution backend of the scans and aggregates: "python" or "numpy"
+EXECUTION_MODE = "python"
+
+# Results of the operations written to AllOperations.txt: "full" (every result table), "head" (first LOG_ROWS rows of
+# every result table), "summary" (attributes and number of rows) or "off"
+LOG_MODE = "full"
+LOG_ROWS = 10
+
+# Number of worker processes used to run independent operations at the same time (1 runs them one after another)
+WORKERS = 1
+
+# Number of worker processes sharing the rows of a large table in select, sum, sumgroup and countgroup (1 disables it)
+SCAN_WORKERS = 1
+
+# Memory budget of the operation result cache in bytes (0 disables the cache)
+CACHE_MEMORY_BUDGET = 0
+
+# Memory budget of the keys of a sort in bytes, larger sorts spill sorted runs to disk (0 sorts in memory)
+SORT_MEMORY_BUDGET = 0
+
+# Memory budget of the hash table of a hash join in bytes, larger joins spill hash partitions to disk (0 joins in memory)
+JOIN_MEMORY_BUDGET = 0
+
+# File the run report with the metrics of every operation is written to (None disables the metrics)
+METRICS_FILE = None
+
+# Whether the peak memory allocated by every operation is traced in the run report (slows the operations down)
+TRACE_MEMORY = False
@@ -0,0 +1,171 @@
+from array import array
+from itertools import compress
+
+'''
+Dictionary encoding of low-cardinality string columns (e.g pricerange), applied when tables are loaded
+An encoded column stores the sorted distinct values of the attribute (the dictionary) and, for every row, the position
+of its value in the dictionary (its code), so codes compare like the values they stand for. Select conditions are
+checked once per distinct value, grouping, sorting and hash joins compare codes instead of strings, and the values
+are only decoded when rows are output (or when a column is rebuilt from rows)
+'''
+
+'''
+Maximum number of distinct values of an encoded column
+'''
+ENCODING_MAX_DISTINCT = 1 << 16
+
+'''
+Minimum average number of rows per distinct value of an encoded column (columns of mostly unique values are kept
+as lists)
+'''
+ENCODING_MIN_REPEATS = 2
+
+'''
+Class represents dictionary encoded columns, which behave like read-only lists of their decoded values
+'''
+class EncodedColumn:
+    '''
+    Method which initializes instance variables of the current column
+    Parameters: codes - typed array of the code of every row
+                values - sorted list of the distinct values, the code of a value is its position
+    '''
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+    '''
+    Method which returns the number of rows of the current column
+    Return: row count
+    '''
+    def __len__(self):
+        return len(self.codes)
+    '''
+    Method which decodes the value of a row, or selects a slice of rows sharing the dictionary
+    Parameters: key - row position or slice
+    Return: attribute value, or an encoded column for a slice
+    '''
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return EncodedColumn(self.codes[key], self.values)
+        return self.values[self.codes[key]]
+    '''
+    Method which decodes the values of the rows in order
+    Return: iterator over attribute values
+    '''
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+'''
+Method which finds the typecode of the codes of a dictionary
+Parameters: num_values - number of values of the dictionary
+Return: typecode of the smallest unsigned array holding every code
+'''
+def code_typecode(num_values):
+    if num_values <= 1 << 8:
+        return "B"
+    if num_values <= 1 << 16:
+        return "H"
+    return "I"
+
+'''
+Method which encodes a column if it holds few distinct strings
+Parameters: column - typed array or list of attribute values
+Return: an encoded column, or the given column if it is not worth encoding
+'''
+def encode_column(column):
+    if isinstance(column, (array, EncodedColumn)) or not column:
+        return column
+    distinct = set(column)
+    if len(distinct) > ENCODING_MAX_DISTINCT or len(distinct) * ENCODING_MIN_REPEATS > len(column):
+        return column
+    # Mixed columns are kept as lists, since strings cannot be ordered with other values
+    if not all(type(value) is str for value in distinct):
+        return column
+    values = sorted(distinct)
+    codes = dict(zip(values, range(len(values))))
+    return EncodedColumn(array(code_typecode(len(values)), map(codes.__getitem__, column)), values)
+
+'''
+Method which concatenates two encoded columns, merging their dictionaries
+Parameters: column1 - encoded column
+            column2 - encoded column
+Return: an encoded column holding the rows of both columns
+'''
+def concat_columns(column1, column2):
+    if column1.values == column2.values:
+        return EncodedColumn(column1.codes + column2.codes, column1.values)
+    values = sorted(set(column1.values).union(column2.values))
+    codes = array(code_typecode(len(values)))
+    for column in (column1, column2):
+        codes.extend(map(translate_codes(column, values).__getitem__, column.codes))
+    return EncodedColumn(codes, values)
+
+'''
+Method which maps the codes of an encoded column to the codes of the same values in another dictionary
+Parameters: column - encoded column
+            values - sorted list of the values of the other dictionary
+Return: list mapping every code of the column to a code of the other dictionary (-1 if the value is not in it)
+'''
+def translate_codes(column, values):
+    codes = dict(zip(values, range(len(values))))
+    return [codes.get(value, -1) for value in column.values]
+
+'''
+Method which finds the values compared by grouping and sorting operations on a column
+Parameters: column - typed array, list of attribute values or encoded column
+Return: the codes of an encoded column, the column itself otherwise
+'''
+def key_column(column):
+    return column.codes if isinstance(column, EncodedColumn) else column
+
+'''
+Method which decodes group keys built from the key columns of the given columns
+Parameters: keys - tuples of key values, one value per column
+            columns - columns the keys were built from
+Return: tuples of attribute values
+'''
+def decode_keys(keys, columns):
+    dictionaries = [column.values if isinstance(column, EncodedColumn) else None for column in columns]
+    if all(dictionary is None for dictionary in dictionaries):
+        return keys
+    return [tuple(value if dictionary is None else dictionary[value] for value, dictionary in zip(key, dictionaries)) for key in keys]
+
+'''
+Method which finds the join keys of an encoded column, as codes of the dictionary of the column it is joined to
+Parameters: column - encoded column
+            other_column - encoded column of the other table
+Return: list of codes, -1 for values missing from the other dictionary (they match no row)
+'''
+def join_key_codes(column, other_column):
+    if column.values == other_column.values:
+        return column.codes
+    return list(map(translate_codes(column, other_column.values).__getitem__, column.codes))
+
+'''
+Method which compiles condition source (on the attribute value "v") into a filter on the codes of an encoded column
+The condition is checked once for every value of the dictionary, then the rows are filtered by their codes
+Parameters: attr_index - index of the attribute used by the condition
+            condition - source of the condition
+            constants - constants used by the source
+            expr - original condition expression
+Return: function (table, row_ids=None) returning the row positions satisfying the condition
+'''
+def compile_select_filter(attr_index, condition, constants, expr):
+    code = compile(condition, "<select {0}>".format(expr), "eval")
+    def row_filter(table, row_ids=None):
+        column = table.columns[attr_index]
+        codes = column.codes
+        try:
+            matching = [bool(eval(code, constants, {"v": value})) for value in column.values]
+        except (TypeError, ValueError, ZeroDivisionError):
+            # Deal with values the condition cannot be checked on: only the given rows are checked, as without encoding
+            return [i for i in (range(len(column)) if row_ids is None else row_ids) if eval(code, constants, {"v": column[i]})]
+        if codes.typecode == "B":
+            # One byte codes are translated to a 0/1 byte per row at once
+            matches = codes.tobytes().translate(bytes(matching) + bytes(256 - len(matching)))
+            if row_ids is None:
+                return list(compress(range(len(matches)), matches))
+            return list(compress(row_ids, map(matches.__getitem__, row_ids)))
+        if row_ids is None:
+            return list(compress(range(len(codes)), map(matching.__getitem__, codes)))
+        return list(compress(row_ids, map(matching.__getitem__, map(codes.__getitem__, row_ids))))
+    return row_filter
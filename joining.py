@@ -0,0 +1,159 @@
+import sys
+from array import array
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+import config
+import metrics
+import spill
+
+'''
+Grace hash join of the join operation, used when config.JOIN_MEMORY_BUDGET is greater than 0 and the hash table of
+the build side would not fit into it
+The join keys of both sides are hash partitioned (with their row positions) to a temporary file, so that rows with
+equal keys land in the same partition, and the partitions are joined one pair at a time with a hash table built on the
+partition of the build side. The matching pairs of every partition are sorted and spilled as a run, then the runs are
+merged lazily, so the result rows are generated in batches, in the order of the in-memory hash join
+A partition holding more rows of a single key than fit into the budget cannot be split, it is joined as it is
+'''
+
+'''
+Estimated memory used by every row of the build side of an in-memory hash join besides its key: its position, its slot
+in the list of positions of its key and the share of its key of the hash table entry and of that list
+'''
+HASH_ROW_OVERHEAD = 28 + 8 + 64
+
+'''
+Number of rows whose keys are measured to estimate the memory used by the keys of a join
+'''
+JOIN_SAMPLE_SIZE = 100
+
+'''
+Maximum number of rows of a spilled block of a partition or of a run of matching pairs, and of a batch of result rows
+'''
+JOIN_BLOCK_ROWS = 4096
+
+'''
+Method which checks whether hash joins are bounded by a memory budget
+Return: boolean value
+'''
+def enabled():
+    return config.JOIN_MEMORY_BUDGET > 0
+
+'''
+Method which estimates the memory used by the hash table of an in-memory hash join for every row of the build side
+Parameters: build_keys - join keys of the rows of the build side
+Return: estimated size in bytes
+'''
+def estimate_row_size(build_keys):
+    sample = build_keys[:JOIN_SAMPLE_SIZE]
+    if not len(sample):
+        return HASH_ROW_OVERHEAD
+    return HASH_ROW_OVERHEAD + sum(map(sys.getsizeof, sample)) // len(sample)
+
+'''
+Method which hash partitions the join keys of one side of the join, with their row positions, to the spill file
+The positions of every partition are buffered and spilled a block at a time, so they stay in ascending order
+Parameters: spill_file - SpillFile of the join
+            keys - join keys of the rows of the side
+            num_partitions - number of partitions
+            block_rows - number of rows of a spilled block
+Return: blocks of every partition
+'''
+def partition_keys(spill_file, keys, num_partitions, block_rows):
+    partitions = [[] for _ in range(num_partitions)]
+    buffers = [[] for _ in range(num_partitions)]
+    for position, key in enumerate(keys):
+        partition = hash(key) % num_partitions
+        buffer = buffers[partition]
+        buffer.append(position)
+        if len(buffer) >= block_rows:
+            partitions[partition].append(spill_file.write_block([array("q", buffer), spill.typed_values(keys, [keys[i] for i in buffer])]))
+            buffer.clear()
+    for blocks, buffer in zip(partitions, buffers):
+        if buffer:
+            blocks.append(spill_file.write_block([array("q", buffer), spill.typed_values(keys, [keys[i] for i in buffer])]))
+    return partitions
+
+'''
+Method which joins two tables with partitions spilled to a temporary file when the hash table of the build side does
+not fit into the memory budget
+Parameters: build_keys - join keys of the rows of the build side
+            probe_keys - join keys of the rows of the probe side
+            build_on_first - True if the build side is the first table of the join
+            order_by_second - True to order the pairs by row of the second table first
+            pair_filter - function (pairs) returning the pairs satisfying the remaining conditions
+Return: iterator over batches of (row of the first table, row of the second table) pairs, None if the join fits into
+        the memory budget
+'''
+def hash_join_pairs(build_keys, probe_keys, build_on_first, order_by_second, pair_filter):
+    budget_rows = max(1, config.JOIN_MEMORY_BUDGET // estimate_row_size(build_keys))
+    if len(build_keys) <= budget_rows:
+        return None
+    num_partitions = -(-len(build_keys) // budget_rows)
+    # Partitioning buffers a block of every partition, so the buffers of all partitions fit into the budget together
+    block_rows = max(1, min(JOIN_BLOCK_ROWS, budget_rows // num_partitions))
+    spill_file = spill.SpillFile("join_partition_")
+    build_partitions = partition_keys(spill_file, build_keys, num_partitions, block_rows)
+    probe_partitions = partition_keys(spill_file, probe_keys, num_partitions, block_rows)
+    spill_file.flush()
+    pair_order = itemgetter(1, 0) if order_by_second else None
+    runs = []
+    for build_blocks, probe_blocks in zip(build_partitions, probe_partitions):
+        if not build_blocks or not probe_blocks:
+            continue
+        hash_table = {}
+        for block in build_blocks:
+            positions, keys = spill_file.read_block(block)
+            for index, key in zip(positions, keys):
+                if key in hash_table:
+                    hash_table[key].append(index)
+                else:
+                    hash_table[key] = [index]
+        pairs = []
+        for block in probe_blocks:
+            positions, keys = spill_file.read_block(block)
+            for probe_index, key in zip(positions, keys):
+                if key in hash_table:
+                    if build_on_first:
+                        pairs.extend([(index, probe_index) for index in hash_table[key]])
+                    else:
+                        pairs.extend([(probe_index, index) for index in hash_table[key]])
+        del hash_table
+        pairs = pair_filter(pairs)
+        # Every pair belongs to a single partition, so sorted runs merge into the order of the in-memory hash join
+        pairs.sort(key=pair_order)
+        blocks = []
+        for start in range(0, len(pairs), block_rows):
+            block_pairs = pairs[start:start + block_rows]
+            blocks.append(spill_file.write_block([array("q", map(itemgetter(0), block_pairs)), array("q", map(itemgetter(1), block_pairs))]))
+        if blocks:
+            runs.append(blocks)
+    spill_file.flush()
+    metrics.annotate("access_path", "executed as a grace hash join ({0} partitions spilled to disk)".format(num_partitions))
+    return merge_runs(spill_file, runs, pair_order)
+
+'''
+Method which merges the spilled runs of matching pairs lazily (k-way merge of the next pair of every run)
+Parameters: spill_file - SpillFile holding the runs (closed once they are merged)
+            runs - blocks of every run
+            pair_order - key ordering the pairs, None for the order of their rows of the first table
+Return: iterator over batches of pairs in the order of the in-memory hash join
+'''
+def merge_runs(spill_file, runs, pair_order):
+    merged = merge(*[read_run(spill_file, blocks) for blocks in runs], key=pair_order)
+    try:
+        yield from iter(lambda: list(islice(merged, JOIN_BLOCK_ROWS)), [])
+    finally:
+        spill_file.close()
+
+'''
+Method which reads a spilled run of matching pairs back, a block at a time
+Parameters: spill_file - SpillFile holding the run
+            blocks - (offset, length, number of pairs, column blocks) of every block of the run
+Return: iterator over the pairs of the run in sorted order
+'''
+def read_run(spill_file, blocks):
+    for block in blocks:
+        rows1, rows2 = spill_file.read_block(block)
+        yield from zip(rows1, rows2)
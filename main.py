@@ -1,10 +1,80 @@
+import argparse
 import time
+import cache
+import config
+import metrics
+import vectorized
 from process import *
+from planner import plan_queries, execute_plan
+from scheduler import parallel_available, execute_parallel
+from utils import close_operation_log
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Execute the operations of a query file, one operation per line")
+    parser.add_argument("query_file", nargs="?", default="test.txt", help="file containing the operations (default: test.txt)")
+    parser.add_argument("--mode", choices=["python", "numpy"], default="python", help="execution backend of scans and aggregates")
+    parser.add_argument("--log", choices=["full", "head", "summary", "off"], default="full", help="results written to AllOperations.txt")
+    parser.add_argument("--log-rows", type=int, default=10, help="number of rows of every result written with --log head")
+    parser.add_argument("--lazy", action="store_true", help="plan the whole query file first, skipping unneeded queries and fusing select/project chains")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes running independent operations at the same time")
+    parser.add_argument("--scan-workers", type=int, default=1, help="number of worker processes sharing the rows of large tables in select and aggregates")
+    parser.add_argument("--cache-mb", type=float, default=0, help="memory budget in MB of the operation result cache (0 disables it)")
+    parser.add_argument("--sort-mb", type=float, default=0, help="memory budget in MB of a sort, larger sorts spill sorted runs to disk (0 sorts in memory)")
+    parser.add_argument("--join-mb", type=float, default=0, help="memory budget in MB of the hash table of a hash join, larger joins spill hash partitions to disk (0 joins in memory)")
+    parser.add_argument("--metrics", metavar="FILE", help="write a JSON run report with the metrics of every operation to FILE")
+    parser.add_argument("--trace-memory", action="store_true", help="add the peak memory of every operation to the run report (slower)")
+    args = parser.parse_args()
+    if args.cache_mb < 0:
+        parser.error("--cache-mb must not be negative")
+    if args.sort_mb < 0:
+        parser.error("--sort-mb must not be negative")
+    if args.join_mb < 0:
+        parser.error("--join-mb must not be negative")
+    if args.log_rows < 0:
+        parser.error("--log-rows must not be negative")
+    if args.scan_workers < 1:
+        parser.error("--scan-workers must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.lazy:
+        parser.error("--workers cannot be combined with --lazy")
+    if args.workers > 1 and not parallel_available():
+        parser.error("--workers requires worker processes to be forked, which this platform does not support")
+    if args.trace_memory and args.metrics is None:
+        parser.error("--trace-memory requires --metrics")
+    if args.mode == "numpy" and vectorized.np is None:
+        parser.error("NumPy is required for --mode numpy")
+    config.EXECUTION_MODE = args.mode
+    config.LOG_MODE = args.log
+    config.LOG_ROWS = args.log_rows
+    config.WORKERS = args.workers
+    config.SCAN_WORKERS = args.scan_workers
+    config.CACHE_MEMORY_BUDGET = int(args.cache_mb * (1 << 20))
+    config.SORT_MEMORY_BUDGET = int(args.sort_mb * (1 << 20))
+    config.JOIN_MEMORY_BUDGET = int(args.join_mb * (1 << 20))
+    config.METRICS_FILE = args.metrics
+    config.TRACE_MEMORY = args.trace_memory
+
     tables = {}           # A dictionary which stores all the created tables
-    with open("test.txt", "r") as f:
+    with open(args.query_file, "r") as f:
         queries = f.readlines()
+    if args.lazy:
+        for step, execution_time in execute_plan(plan_queries(queries), tables):
+            if step.action == "run":
+                print("Query Executed: ", step.query)
+                print("Execution Time: ", execution_time, "sec\n")
+            elif step.action == "fuse":
+                print("Query Fused: ", step.query)
+                print("Execution Time: ", execution_time, "sec\n")
+            else:
+                print("Query Skipped: ", step.query, "\n")
+        queries = []
+    elif args.workers > 1:
+        for query, output, execution_time in execute_parallel(queries, tables):
+            print(output, end="")
+            print("Query Executed: ", query)
+            print("Execution Time: ", execution_time, "sec\n")
+        queries = []
     for query in queries:
         query = query.strip()
         start_time = time.time()
@@ -12,6 +82,12 @@ if __name__ == "__main__":
         end_time = time.time()
         print("Query Executed: ", query)
         print("Execution Time: ", end_time-start_time, "sec\n")
+    # Every logged result is written before the run ends, so an error of the log writer thread fails the run
+    close_operation_log()
+    if cache.enabled():
+        print(cache.format_stats())
+    if metrics.enabled():
+        print(metrics.write_report())
 
     '''
     query = ""
@@ -0,0 +1,161 @@
+import json
+import time
+import tracemalloc
+import config
+
+'''
+Metrics of the operations, collected when config.METRICS_FILE is set (main.py --metrics FILE)
+Every operation gets one entry in the run report: its wall time, the rows of its input and result tables, the access
+path or join strategy it used (and which index), the number of rows or row pairs its compiled conditions checked and,
+with config.TRACE_MEMORY, the peak memory it allocated. The report is written to config.METRICS_FILE as JSON
+'''
+
+'''
+Entries of the run report in the order of the operations
+'''
+report = []
+
+'''
+Entry of the operation being run, None when no operation is measured
+'''
+current = None
+
+'''
+Method which checks whether the metrics of the operations are collected
+Return: boolean value
+'''
+def enabled():
+    return config.METRICS_FILE is not None
+
+'''
+Method which records a metric of the operation being run
+Parameters: name - name of the metric
+            value - value of the metric
+'''
+def record(name, value):
+    if current is not None:
+        current[name] = value
+
+'''
+Method which appends a note to a metric of the operation being run (e.g how a chosen strategy was executed)
+Parameters: name - name of the metric
+            note - text appended to the value of the metric
+'''
+def annotate(name, note):
+    if current is not None:
+        current[name] = note if current[name] is None else "{0}, {1}".format(current[name], note)
+
+'''
+Method which adds predicate evaluations to the operation being run
+Parameters: num_evaluations - number of rows (or pairs of rows) a condition was checked on
+'''
+def count_evaluations(num_evaluations):
+    if current is not None:
+        current["predicate_evaluations"] += num_evaluations
+
+'''
+Method which wraps a compiled select filter so that the rows it checks are counted
+Parameters: row_filter - function (table, row_ids) returning the row positions satisfying a condition
+Return: function with the same parameters and result
+'''
+def counted_select_filter(row_filter):
+    def counted_filter(table, row_ids=None):
+        count_evaluations(len(table) if row_ids is None else len(row_ids))
+        return row_filter(table, row_ids)
+    return counted_filter
+
+'''
+Method which wraps a compiled join filter so that the pairs of rows it checks are counted
+Parameters: pair_filter - function (table1, table2, pairs) returning the pairs satisfying a condition
+Return: function with the same parameters and result
+'''
+def counted_pair_filter(pair_filter):
+    def counted_filter(table1, table2, pairs):
+        count_evaluations(len(pairs))
+        return pair_filter(table1, table2, pairs)
+    return counted_filter
+
+'''
+Method which wraps a compiled join condition so that its calls are counted
+Parameters: condition - function (record1, record2) checking a condition on a pair of records
+Return: function with the same parameters and result
+'''
+def counted_condition(condition):
+    def counted(record1, record2):
+        current["predicate_evaluations"] += 1
+        return condition(record1, record2)
+    return counted if current is not None else condition
+
+'''
+Method which runs an operation and adds its metrics to the run report
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the result (None for operations without result table)
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+            run - function running the operation with the same parameters
+'''
+def measure_operation(op_name, result_table_name, params, tables, run):
+    global current
+    if op_name in ("inputfromfile", "loadtable", "explain"):
+        input_names = []
+    else:
+        input_names = params[:2] if op_name in ("join", "concat") else params[:1]
+    previous_table = tables.get(result_table_name)
+    entry = {
+        "operation": op_name,
+        "query": "{0}{1}({2})".format(result_table_name + " := " if result_table_name else "", op_name, ", ".join(params)),
+        "rows_in": sum(len(tables[name]) for name in input_names if name in tables),
+        "rows_out": None,
+        "time": None,
+        "access_path": None,
+        "index": None,
+        "predicate_evaluations": 0,
+        "peak_memory": None,
+    }
+    current = entry
+    if config.TRACE_MEMORY:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start_time = time.perf_counter()
+    try:
+        run(op_name, result_table_name, params, tables)
+    finally:
+        entry["time"] = time.perf_counter() - start_time
+        if config.TRACE_MEMORY:
+            entry["peak_memory"] = tracemalloc.get_traced_memory()[1] - start_memory
+        current = None
+        result_table = tables.get(result_table_name)
+        if result_table is not None and result_table is not previous_table:
+            entry["rows_out"] = len(result_table)
+        report.append(entry)
+
+'''
+Method which sums the metrics of the run report for every operation name
+Return: dictionary operation name -> number of operations, total time, rows in/out and predicate evaluations
+'''
+def summarize_report():
+    totals = {}
+    for entry in report:
+        total = totals.setdefault(entry["operation"], {"count": 0, "time": 0, "rows_in": 0, "rows_out": 0, "predicate_evaluations": 0})
+        total["count"] += 1
+        total["time"] += entry["time"]
+        total["rows_in"] += entry["rows_in"]
+        total["rows_out"] += entry["rows_out"] or 0
+        total["predicate_evaluations"] += entry["predicate_evaluations"]
+    return totals
+
+'''
+Method which writes the run report to config.METRICS_FILE
+Return: text describing the written report
+'''
+def write_report():
+    with open(config.METRICS_FILE, "w") as f:
+        json.dump({"settings": {"mode": config.EXECUTION_MODE, "workers": config.WORKERS, "scan_workers": config.SCAN_WORKERS,
+                                "cache_memory_budget": config.CACHE_MEMORY_BUDGET,
+                                "sort_memory_budget": config.SORT_MEMORY_BUDGET,
+                                "join_memory_budget": config.JOIN_MEMORY_BUDGET, "trace_memory": config.TRACE_MEMORY},
+                   "operations": report, "totals": summarize_report()}, f, indent=2)
+    return "Metrics Report: {0} operations ({1:.4f} sec) written to {2}".format(
+        len(report), sum(entry["time"] for entry in report), config.METRICS_FILE)
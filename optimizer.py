@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+
+'''
+Statistics of the columns of tables and the cost model choosing between the access paths of select and join
+Statistics are computed when a table is analyzed (analyze(T): exact values over every row), or on first use from an
+evenly spaced sample of the rows. They are used to estimate the fraction of rows satisfying a condition (selectivity),
+from which the costs of the alternatives are compared. Costs are in units of one row checked by a scan
+'''
+
+'''
+Number of rows sampled by automatic statistics
+'''
+STATISTICS_SAMPLE_SIZE = 10000
+
+'''
+Number of buckets of the equi-depth histograms
+'''
+HISTOGRAM_BUCKETS = 32
+
+'''
+Minimum number of rows of a table for the cost model to be used (smaller tables keep the rule-based choices)
+'''
+OPTIMIZER_MIN_ROWS = 1000
+
+'''
+Selectivity of conditions that cannot be estimated (e.g comparisons of two attributes)
+'''
+DEFAULT_SELECTIVITY = 1 / 3
+
+'''
+Cost of every row found with an index lookup (including the check of the condition on the row), relative to checking
+a row with a scan
+'''
+INDEX_ROW_COST = 3
+
+'''
+Costs of a join: every row probing an index (row by row), every row of both tables when a hash table is built on the
+fly (columnar), and every result row of an index join (built row by row) and of a hash join
+'''
+INDEX_PROBE_COST = 1
+HASH_JOIN_ROW_COST = 2
+INDEX_JOIN_RESULT_COST = 3
+HASH_JOIN_RESULT_COST = 1
+
+'''
+Statistics of a column
+num_rows - number of rows, num_distinct - number of distinct values (estimated from the sample if sampled)
+min/max - smallest/largest value, histogram - bounds of the equi-depth buckets (HISTOGRAM_BUCKETS + 1 values, the
+same number of rows between every two bounds), sampled - whether the statistics were computed from a sample
+min, max and histogram are None for columns whose values cannot be ordered (e.g strings mixed with integers)
+'''
+ColumnStatistics = namedtuple("ColumnStatistics", ["num_rows", "num_distinct", "min", "max", "histogram", "sampled"])
+
+'''
+Method which computes the statistics of a column
+Parameters: column - typed array or list of attribute values
+            exact - True to use every value, False to use an evenly spaced sample of STATISTICS_SAMPLE_SIZE values
+Return: statistics of the column, None if the column is empty
+'''
+def compute_column_statistics(column, exact):
+    num_rows = len(column)
+    if not num_rows:
+        return None
+    step = 1 if exact else max(1, num_rows // STATISTICS_SAMPLE_SIZE)
+    sample = column[::step]
+    sampled = len(sample) < num_rows
+    if sampled:
+        # Estimate the distinct values of the whole column from the values seen once in the sample (GEE estimator)
+        counts = Counter(sample)
+        num_once = sum(1 for value_count in counts.values() if value_count == 1)
+        num_distinct = min(num_rows, round((num_rows / len(sample)) ** 0.5 * num_once + len(counts) - num_once))
+    else:
+        num_distinct = len(set(sample))
+    try:
+        sample = sorted(sample)
+        column_min, column_max = (min(column), max(column)) if sampled else (sample[0], sample[-1])
+    except TypeError:
+        # Deal with values that cannot be ordered (e.g digit-only values loaded as integers in a string column)
+        return ColumnStatistics(num_rows, max(1, num_distinct), None, None, None, sampled)
+    histogram = [sample[i * (len(sample) - 1) // HISTOGRAM_BUCKETS] for i in range(HISTOGRAM_BUCKETS + 1)]
+    return ColumnStatistics(num_rows, max(1, num_distinct), column_min, column_max, histogram, sampled)
+
+'''
+Method which estimates the fraction of the rows of a column whose value is lower than (or equal to) a value
+Parameters: statistics - statistics of the column
+            value - compared value
+            inclusive - True to count the rows equal to the value
+Return: fraction between 0 and 1
+'''
+def estimate_fraction_below(statistics, value, inclusive):
+    histogram = statistics.histogram
+    position = bisect_right(histogram, value) if inclusive else bisect_left(histogram, value)
+    if position == 0:
+        return 0.0
+    if position > HISTOGRAM_BUCKETS:
+        return 1.0
+    # Deal with the value inside bucket position - 1, interpolated for numeric values
+    low, high = histogram[position - 1], histogram[position]
+    if isinstance(value, str) or high == low:
+        within = 0.5
+    else:
+        within = (value - low) / (high - low)
+    return (position - 1 + within) / HISTOGRAM_BUCKETS
+
+'''
+Method which estimates the selectivity of an equality condition
+Parameters: statistics - statistics of the column
+            value - value the attribute is compared to
+Return: fraction of rows with the value
+'''
+def estimate_equal_selectivity(statistics, value):
+    if statistics.histogram is None:
+        return 1 / statistics.num_distinct
+    if value < statistics.min or value > statistics.max:
+        return 0.0
+    # A value found as several bounds of the histogram fills the buckets between them (frequent value)
+    num_bounds = bisect_right(statistics.histogram, value) - bisect_left(statistics.histogram, value)
+    if num_bounds > 1:
+        return (num_bounds - 1) / HISTOGRAM_BUCKETS
+    return 1 / statistics.num_distinct
+
+'''
+Method which estimates the selectivity of a range condition
+Parameters: statistics - statistics of the column
+            key_range - KeyRange of the values satisfying the condition
+Return: fraction of rows inside the range
+'''
+def estimate_range_selectivity(statistics, key_range):
+    if statistics.histogram is None:
+        return DEFAULT_SELECTIVITY
+    high = 1.0 if key_range.high is None else estimate_fraction_below(statistics, key_range.high, not key_range.exclude_high)
+    low = 0.0 if key_range.low is None else estimate_fraction_below(statistics, key_range.low, key_range.exclude_low)
+    return max(0.0, high - low)
+
+'''
+Method which estimates the number of result rows of an equality join
+Parameters: statistics1 - statistics of the join attribute of the first table
+            statistics2 - statistics of the join attribute of the second table
+Return: estimated number of pairs of rows with equal values
+'''
+def estimate_join_rows(statistics1, statistics2):
+    return statistics1.num_rows * statistics2.num_rows / max(statistics1.num_distinct, statistics2.num_distinct)
+
+'''
+Method which computes the cost of an index nested loop join
+Parameters: num_probe_rows - number of rows probing the index
+            num_result_rows - estimated number of result rows
+Return: cost
+'''
+def index_join_cost(num_probe_rows, num_result_rows):
+    return num_probe_rows * INDEX_PROBE_COST + num_result_rows * INDEX_JOIN_RESULT_COST
+
+'''
+Method which computes the cost of a hash join with a hash table built on the fly
+Parameters: num_rows1 - number of rows of the first table
+            num_rows2 - number of rows of the second table
+            num_result_rows - estimated number of result rows
+Return: cost
+'''
+def hash_join_cost(num_rows1, num_rows2, num_result_rows):
+    return (num_rows1 + num_rows2) * HASH_JOIN_ROW_COST + num_result_rows * HASH_JOIN_RESULT_COST
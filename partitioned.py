@@ -0,0 +1,194 @@
+import atexit
+import multiprocessing
+import re
+from array import array
+from multiprocessing import shared_memory
+import config
+
+'''
+Partitioned execution of scans and aggregates, used when config.SCAN_WORKERS is greater than 1
+The rows of a large table are split into one range per worker. Typed columns are copied once into shared memory, which
+the workers read without the table being pickled (string columns are sent as slices). The partial results are merged
+in the order of the partitions, so results are identical to the serial path; every method returns None when it cannot
+guarantee that (e.g sums of floats, whose rounding depends on the order of the additions)
+'''
+
+'''
+Minimum number of rows of a table for its scans and aggregates to be partitioned
+'''
+PARTITION_MIN_ROWS = 50000
+
+'''
+Pool of worker processes, created on first use
+'''
+pool = None
+
+'''
+Method which checks whether the scans and aggregates of a table are partitioned
+Parameters: num_rows - number of rows of the table
+Return: boolean value
+'''
+def enabled(num_rows):
+    # Worker processes (of this pool or of the parallel scheduler) never start a pool themselves
+    return config.SCAN_WORKERS > 1 and num_rows >= PARTITION_MIN_ROWS and multiprocessing.parent_process() is None
+
+'''
+Method which returns the pool of worker processes, creating it on first use
+Return: multiprocessing pool
+'''
+def get_pool():
+    global pool
+    if pool is None:
+        pool = multiprocessing.Pool(config.SCAN_WORKERS)
+        atexit.register(pool.terminate)
+    return pool
+
+'''
+Method which splits the rows of a table into one range per worker
+Parameters: num_rows - number of rows of the table
+Return: list of (start, end) row ranges in ascending order
+'''
+def partition_ranges(num_rows):
+    num_partitions = min(config.SCAN_WORKERS, num_rows)
+    bounds = [num_rows * i // num_partitions for i in range(num_partitions + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+'''
+Method which runs a task on every partition of the given columns
+Parameters: task - name of the task (see run_partition)
+            columns - columns needed by the task
+            args - other parameters of the task
+Return: list of partial results in the order of the partitions
+'''
+def map_partitions(task, columns, args):
+    blocks = []
+    try:
+        shared = []
+        for column in columns:
+            if isinstance(column, array) and len(column):
+                block = shared_memory.SharedMemory(create=True, size=len(column) * column.itemsize)
+                blocks.append(block)
+                block.buf[:len(column) * column.itemsize] = memoryview(column).cast("B")
+                shared.append((block.name, column.typecode))
+            else:
+                shared.append(None)
+        tasks = []
+        for start, end in partition_ranges(len(columns[0])):
+            specs = [spec if spec is not None else column[start:end] for spec, column in zip(shared, columns)]
+            tasks.append((task, specs, start, end, args))
+        return get_pool().starmap(run_partition, tasks)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+'''
+Method which runs a task on one partition inside a worker process
+Parameters: task - "sum", "group" or "select"
+            specs - (shared memory name, typecode) of typed columns, values of the partition for the other columns
+            start, end - row range of the partition
+            args - other parameters of the task
+Return: partial result of the task
+'''
+def run_partition(task, specs, start, end, args):
+    columns = []
+    for spec in specs:
+        if isinstance(spec, tuple):
+            block = shared_memory.SharedMemory(name=spec[0])
+            column = array(spec[1])
+            column.frombytes(block.buf[start * column.itemsize:end * column.itemsize])
+            block.close()
+            columns.append(column)
+        else:
+            columns.append(spec)
+    if task == "sum":
+        return sum(columns[0])
+    if task == "group":
+        has_sum_column = args
+        return partial_groups(columns[0] if has_sum_column else None, columns[1:] if has_sum_column else columns)
+    # Deal with select: the condition is compiled again by the worker on a table holding the partition
+    from table import Table
+    from process import find_select_rows
+    header, condition = args
+    partition_table = Table()
+    partition_table.header = header
+    partition_table.columns = columns
+    row_ids = find_select_rows(partition_table, condition)
+    return array("q", [i + start for i in (row_ids.tolist() if hasattr(row_ids, "tolist") else row_ids)])
+
+'''
+Method which calculates the sums and counts of every group inside a partition
+Parameters: sum_column - values of the summed attribute, None to only count rows
+            group_columns - values of the group attributes
+Return: dictionary group key -> [sum, count] in order of the first row of every group
+'''
+def partial_groups(sum_column, group_columns):
+    groups = {}
+    keys = zip(*group_columns)
+    if sum_column is None:
+        for key in keys:
+            if key in groups:
+                groups[key][1] += 1
+            else:
+                groups[key] = [0, 1]
+        return groups
+    for key, value in zip(keys, sum_column):
+        if key in groups:
+            group = groups[key]
+            group[0] += value
+            group[1] += 1
+        else:
+            groups[key] = [value, 1]
+    return groups
+
+'''
+Method which calculates the sum of an integer column with one partition per worker
+Parameters: column - typed array or list of attribute values
+Return: the sum, None if the column is not handled
+'''
+def column_sum(column):
+    if not isinstance(column, array) or column.typecode != "q":
+        return None
+    return sum(map_partitions("sum", [column], None))
+
+'''
+Method which calculates sum/count of a column for every group with one partition per worker
+Parameters: sum_column - column of the attribute that needs to be summed, None to only count rows
+            group_columns - columns of the group attributes
+Return: group keys (in order of their first row), sums and counts of every group, None if not handled
+'''
+def group_aggregate(sum_column, group_columns):
+    if not group_columns:
+        return None
+    if sum_column is not None and (not isinstance(sum_column, array) or sum_column.typecode != "q"):
+        return None
+    columns = ([sum_column] if sum_column is not None else []) + list(group_columns)
+    groups = {}
+    # Partitions are merged in order, so every group keeps the position of its first row in the table
+    for partial in map_partitions("group", columns, sum_column is not None):
+        for key, (group_sum, group_count) in partial.items():
+            if key in groups:
+                group = groups[key]
+                group[0] += group_sum
+                group[1] += group_count
+            else:
+                groups[key] = [group_sum, group_count]
+    keys = list(groups)
+    return keys, [group[0] for group in groups.values()], [group[1] for group in groups.values()]
+
+'''
+Method which finds the rows of a table satisfying a select condition with one partition per worker
+Parameters: table - table the select operation is performed on
+            condition - condition of the select operation
+Return: row positions satisfying the condition in ascending order, None if the condition uses no attribute
+'''
+def select_rows(table, condition):
+    # Only the attributes used by the condition are sent to the workers
+    header = [attr for attr in table.header if re.search(r"\b{0}\b".format(re.escape(attr)), condition)]
+    columns = [table.columns[table.get_attr_index(attr)] for attr in header]
+    if not columns:
+        return None
+    row_ids = array("q")
+    for partial in map_partitions("select", columns, (header, condition)):
+        row_ids.extend(partial)
+    return row_ids
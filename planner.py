@@ -0,0 +1,189 @@
+import time
+from collections import namedtuple
+import config
+from process import parse_query, process_operation, find_select_rows
+
+'''
+Lazy execution of a whole query file (main.py --lazy)
+The queries are first turned into a dependency graph: every query depends on the queries that created its input tables
+Queries which neither write a file nor have their result logged (and are not needed by such a query) are skipped
+Chains of select/project whose intermediate tables are used only once are fused: the selects only narrow a list of row
+positions of the first table and the projects a list of attributes, and the rows are gathered once, with only the
+attributes needed by the query consuming the chain
+'''
+
+'''
+Query of a plan
+query - original query, op_name/result_table_name/params - parsed query
+inputs - plan positions of the queries that created the input tables (None for tables that do not exist yet)
+action - "run", "fuse" (kept as a pending select/project chain) or "skip" (result never needed)
+'''
+PlanStep = namedtuple("PlanStep", ["query", "op_name", "result_table_name", "params", "inputs", "action"])
+
+'''
+Operations creating a table from a file, without input tables
+'''
+SOURCE_OPERATIONS = ("inputfromfile", "loadtable")
+
+'''
+Operations with two input tables
+'''
+BINARY_OPERATIONS = ("join", "concat")
+
+'''
+Operations writing files or printing the plan of a query (explain), always executed
+'''
+OUTPUT_OPERATIONS = ("outputtofile", "savetable", "explain")
+
+'''
+Operations modifying their input table (index creation, statistics), executed only if the table is needed by another
+query
+'''
+INDEX_OPERATIONS = ("Hash", "Btree", "analyze")
+
+'''
+Operations that can be fused with the queries consuming their result
+'''
+FUSABLE_OPERATIONS = ("select", "project")
+
+'''
+Method which finds the names of the input tables of a query
+Parameters: op_name - name of the operation
+            params - parameters of the operation
+Return: list of table names
+'''
+def get_input_table_names(op_name, params):
+    if op_name == "explain":
+        # The explained query is not executed but needs its input tables
+        explained_op_name, _, explained_params = parse_query(params[0])
+        return get_input_table_names(explained_op_name, explained_params)
+    if op_name in SOURCE_OPERATIONS:
+        return []
+    if op_name in BINARY_OPERATIONS:
+        return params[:2]
+    return params[:1]
+
+'''
+Method which finds the attributes of its input table a query needs
+Parameters: op_name - name of the operation
+            params - parameters of the operation
+Return: list of attribute names, None if every attribute is needed
+'''
+def get_needed_attrs(op_name, params):
+    if op_name == "count":
+        return []
+    if op_name in ("sum", "avg"):
+        return params[1:2]
+    if op_name in ("sumgroup", "avggroup", "countgroup"):
+        return params[1:]
+    return None
+
+'''
+Method which builds the plan of a query file
+Parameters: queries - input queries (empty lines and comments starting with // are ignored)
+Return: list of plan steps in the order of the queries
+'''
+def plan_queries(queries):
+    steps = []
+    # Plan position of the query that created every table (redefined tables refer to their latest creation)
+    creators = {}
+    for query in queries:
+        query = query.strip()
+        if not query or query.startswith("//"):
+            continue
+        op_name, result_table_name, params = parse_query(query)
+        inputs = [creators.get(name) for name in get_input_table_names(op_name, params)]
+        steps.append(PlanStep(query, op_name, result_table_name, params, inputs, "run"))
+        if result_table_name is not None:
+            creators[result_table_name] = len(steps) - 1
+    consumers = [[] for _ in steps]
+    for position, step in enumerate(steps):
+        for input_position in step.inputs:
+            if input_position is not None:
+                consumers[input_position].append(position)
+    # Deal with the needed queries, from the outputs (and logged results) back to the tables they read
+    log_results = config.LOG_MODE != "off"
+    needed = [False] * len(steps)
+    for position in range(len(steps) - 1, -1, -1):
+        step = steps[position]
+        if step.op_name in OUTPUT_OPERATIONS or (log_results and step.result_table_name is not None):
+            needed[position] = True
+        elif step.op_name not in INDEX_OPERATIONS:
+            needed[position] = any(needed[consumer] and steps[consumer].op_name not in INDEX_OPERATIONS for consumer in consumers[position])
+        if needed[position]:
+            for input_position in step.inputs:
+                if input_position is not None:
+                    needed[input_position] = True
+    for position, step in enumerate(steps):
+        if step.op_name in INDEX_OPERATIONS:
+            needed[position] = step.inputs[0] is None or needed[step.inputs[0]]
+    for position, step in enumerate(steps):
+        if not needed[position]:
+            action = "skip"
+        elif step.op_name in FUSABLE_OPERATIONS and not (log_results and step.result_table_name is not None):
+            # Only tables read by a single query that does not keep, modify or explain them can stay pending
+            live_consumers = [consumer for consumer in consumers[position] if needed[consumer]]
+            fusable = len(live_consumers) == 1 and steps[live_consumers[0]].op_name not in INDEX_OPERATIONS + ("savetable", "explain")
+            action = "fuse" if fusable else "run"
+        else:
+            action = "run"
+        steps[position] = step._replace(action=action)
+    return steps
+
+'''
+Method which applies a select/project query to a pending chain
+Parameters: step - plan step of the select/project query
+            chain - (first table, row positions or None for every row, attribute names) of the input table
+Return: chain of the result table
+'''
+def extend_chain(step, chain):
+    table, row_ids, attrs = chain
+    if step.op_name == "select":
+        return table, find_select_rows(table, step.params[1], row_ids), attrs
+    return table, row_ids, [attr for attr in attrs if attr in step.params[1:]]
+
+'''
+Method which materializes a pending chain as a table
+Parameters: chain - (first table, row positions or None for every row, attribute names)
+            needed_attrs - attributes needed by the consuming query, None if every attribute is needed
+Return: table containing the rows and attributes of the chain
+'''
+def materialize_chain(chain, needed_attrs):
+    table, row_ids, attrs = chain
+    if needed_attrs is not None:
+        # Keep one attribute at least so that the rows can still be counted
+        attrs = [attr for attr in attrs if attr in needed_attrs] or attrs[:1]
+    result_table = table.project(attrs)
+    return result_table if row_ids is None else result_table.take(row_ids)
+
+'''
+Method which executes a plan
+Parameters: steps - plan steps built by plan_queries
+            tables - a dictionary that stores all the created tables
+Return: iterator over (plan step, execution time in seconds) in the order of the queries
+'''
+def execute_plan(steps, tables):
+    chains = {}
+    for position, step in enumerate(steps):
+        start_time = time.time()
+        if step.action == "fuse":
+            input_position = step.inputs[0]
+            if input_position in chains:
+                chain = chains.pop(input_position)
+            else:
+                # Chains on a view start from the rows it selects inside its base table
+                base_table, row_ids, attr_indices = tables[step.params[0]].view_parts()
+                chain = (base_table, row_ids, [base_table.header[i] for i in attr_indices])
+            chains[position] = extend_chain(step, chain)
+        elif step.action == "run":
+            step_tables = tables
+            pending = [(name, chains.pop(input_position)) for name, input_position in zip(step.params, step.inputs) if input_position in chains]
+            if pending:
+                # The consumed chains are materialized for this query only
+                step_tables = dict(tables)
+                for name, chain in pending:
+                    step_tables[name] = materialize_chain(chain, get_needed_attrs(step.op_name, step.params))
+            process_operation(step.op_name, step.result_table_name, step.params, step_tables)
+            if step_tables is not tables and step.result_table_name is not None:
+                tables[step.result_table_name] = step_tables[step.result_table_name]
+        yield step, time.time() - start_time
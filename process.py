@@ -1,4 +1,14 @@
-from table import Table
+import re
+import time
+from collections import namedtuple
+from functools import reduce
+from operator import itemgetter, mul
+import cache
+import config
+import metrics
+import optimizer
+import partitioned
+from table import Table, KeyRange, intersect_key_ranges, make_view
 from utils import *
 
 '''
@@ -11,7 +21,10 @@ Result: generate a new table with the given table name
 '''
 def process_inputfromfile(op_name, result_table_name, params, tables):
     file_name = params[0]
+    start_time = time.perf_counter()
     result_table = input_from_file(file_name)
+    load_time = time.perf_counter() - start_time
+    print("Rows Loaded: ", len(result_table), "({0:.0f} rows/sec)".format(len(result_table) / load_time if load_time > 0 else 0))
     tables[result_table_name] = result_table
     output_operation_result(op_name, result_table_name, result_table)
 
@@ -26,40 +39,415 @@ Result: generate a new table containing the select result
 def process_select(op_name, result_table_name, params, tables):
     target_table_name = params[0]
     target_table = tables[target_table_name]
-    index_attr = None
-    index_key = None
-    if is_complex_expr(params[1]):
+    # A select on a view only narrows the row positions it selects inside its base table
+    base_table, row_ids, attr_indices = target_table.view_parts()
+    result_table = make_view(base_table, find_select_rows(base_table, params[1], row_ids), attr_indices)
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
+'''
+Access path of a select operation
+conditions - conditions of the select operation in evaluation order, logop - "and"/"or" separating them (None for a
+single condition)
+index_attrs/index_keys - attributes with index and index key values (or KeyRange) used to find the rows: one per
+condition for "or", the cheapest lookup otherwise; None when the rows are scanned
+partitioned - whether the scan is split across the scan workers
+estimated_rows - estimated number of result rows, None for tables too small for the cost model
+'''
+SelectPath = namedtuple("SelectPath", ["conditions", "logop", "index_attrs", "index_keys", "partitioned", "estimated_rows"])
+
+'''
+Method which chooses how the rows satisfying the condition of a select operation are found
+On tables with at least optimizer.OPTIMIZER_MIN_ROWS rows, the selectivity of every condition is estimated from the
+statistics of the table: an index is only used when looking up its rows is cheaper than scanning the table, and
+conditions separated by "and" are checked from the most selective one, so that the next ones check fewer rows
+Parameters: target_table - table the select operation is performed on
+            condition - condition of the select operation
+            row_ids - row positions the search is restricted to, None for the whole table
+Return: access path of the select operation
+'''
+def choose_select_path(target_table, condition, row_ids=None):
+    if is_complex_expr(condition):
         # Deal with multiple conditions
-        conditions, logops = parse_complex_expr(params[1])
-        relop_evals = []
-        for cond in conditions:
-            relop_eval = evaluate_select_relop_expr(cond)
-            relop_evals.append(relop_eval)
-            relop_expr = parse_relop_expr(cond)
-            # Find attribute with index inside equality condition
-            if relop_expr[1] == "=":
-                attr, value = get_select_equal_relop_attr_value(relop_expr)
-                if attr in target_table.attr_with_hash_index or attr in target_table.attr_with_btree_index:
-                    index_attr = attr
-                    index_key = value
-        if logops[0] == "and":
-            result_table = target_table.select_and(relop_evals, index_attr, index_key)
+        conditions, logops = parse_complex_expr(condition)
+        logop = logops[0]
+    else:
+        conditions, logop = [condition], None
+    num_rows = len(target_table) if row_ids is None else len(row_ids)
+    use_costs = num_rows >= optimizer.OPTIMIZER_MIN_ROWS
+    estimated_rows = None
+    if use_costs:
+        selectivities = [estimate_select_selectivity(target_table, cond) for cond in conditions]
+        if logop == "and":
+            conditions = [cond for _, cond in sorted(zip(selectivities, conditions), key=itemgetter(0))]
+            estimated_rows = num_rows * reduce(mul, selectivities, 1.0)
+        elif logop == "or":
+            # Every condition of "or" checks every row (column by column), so their order does not change the work
+            estimated_rows = num_rows * (1 - reduce(mul, (1 - selectivity for selectivity in selectivities), 1.0))
         else:
-            result_table = target_table.select_or(relop_evals, index_attr, index_key)
+            estimated_rows = num_rows * selectivities[0]
+    # Find attribute with index inside equality/range condition (indexes only cover the whole table)
+    cond_index_candidates = [find_select_index(target_table, parse_relop_expr(cond)) if row_ids is None else [] for cond in conditions]
+    index_attrs = None
+    index_keys = None
+    if logop == "or":
+        # Indexes are only useful if every condition can be answered by one, otherwise the table is scanned anyway
+        if all(cond_index_candidates):
+            index_attrs = [candidates[0][0] for candidates in cond_index_candidates]
+            index_keys = [candidates[0][1] for candidates in cond_index_candidates]
+            index_rows = [estimate_index_rows(target_table, attr, key) for attr, key in zip(index_attrs, index_keys)] if use_costs else []
+            # Lookups without estimate keep the rule-based choice (every index is used)
+            if index_rows and None not in index_rows and sum(index_rows) * optimizer.INDEX_ROW_COST >= num_rows * len(conditions):
+                index_attrs = index_keys = None
     else:
-        # Deal with single condition
-        condition = params[1]
-        relop_eval = evaluate_select_relop_expr(condition)
-        relop_expr = parse_relop_expr(condition)
-        # Find attribute with index inside equality condition
-        if relop_expr[1] == "=":
+        index_candidates = merge_select_ranges([candidate for candidates in cond_index_candidates for candidate in candidates])
+        index_estimates = [(estimate_index_rows(target_table, *candidate), candidate) for candidate in index_candidates] if use_costs else []
+        if index_estimates and all(index_rows is not None for index_rows, _ in index_estimates):
+            # Use the index lookup returning the fewest rows, if it is cheaper than a scan
+            index_rows, index_candidate = min(index_estimates, key=itemgetter(0))
+            index_candidates = [index_candidate] if index_rows * optimizer.INDEX_ROW_COST < num_rows else []
+        elif len(index_candidates) > 1:
+            # Deal with lookups without estimate (or tables too small for the cost model): the smallest lookup is used
+            index_candidates = [min(index_candidates, key=lambda candidate: len(target_table.lookup_index(*candidate)))]
+        if index_candidates:
+            index_attrs = [index_candidates[0][0]]
+            index_keys = [index_candidates[0][1]]
+    partitioned_scan = index_attrs is None and row_ids is None and partitioned.enabled(len(target_table))
+    return SelectPath(conditions, logop, index_attrs, index_keys, partitioned_scan, estimated_rows)
+
+'''
+Method which estimates the fraction of the rows of a table satisfying a condition inside select operation
+Parameters: target_table - table the select operation is performed on
+            cond - condition (relop expression)
+Return: estimated selectivity between 0 and 1
+'''
+def estimate_select_selectivity(target_table, cond):
+    relop_expr = parse_relop_expr(cond)
+    try:
+        if relop_expr[1] in ("=", "!="):
             attr, value = get_select_equal_relop_attr_value(relop_expr)
-            if attr in target_table.attr_with_hash_index or attr in target_table.attr_with_btree_index:
-                index_attr = attr
-                index_key = value
-        result_table = target_table.select(relop_eval, index_attr, index_key)
-    tables[result_table_name] = result_table
-    output_operation_result(op_name, result_table_name, result_table)
+            column_statistics = target_table.get_statistics(attr)
+            if column_statistics is not None:
+                selectivity = optimizer.estimate_equal_selectivity(column_statistics, value)
+                return selectivity if relop_expr[1] == "=" else 1 - selectivity
+        elif relop_expr[1] in MIRRORED_RELOP:
+            attr_range = get_select_range_relop_attr_range(relop_expr)
+            if attr_range is not None:
+                column_statistics = target_table.get_statistics(attr_range[0])
+                if column_statistics is not None:
+                    return optimizer.estimate_range_selectivity(column_statistics, attr_range[1])
+    except (TypeError, ValueError, ZeroDivisionError):
+        # Deal with values that cannot be compared to the values of the attribute (e.g a string with a number attribute)
+        pass
+    return optimizer.DEFAULT_SELECTIVITY
+
+'''
+Method which estimates the number of rows found by an index lookup
+Equality lookups are counted exactly (one dictionary access), range scans are estimated from the statistics
+Parameters: target_table - table the select operation is performed on
+            index_attr - attribute with index
+            index_key - index key value or KeyRange
+Return: number of rows, None if the attribute has no statistics
+'''
+def estimate_index_rows(target_table, index_attr, index_key):
+    if not isinstance(index_key, KeyRange):
+        return len(target_table.lookup_index(index_attr, index_key))
+    try:
+        column_statistics = target_table.get_statistics(index_attr)
+        if column_statistics is None:
+            return None
+        return len(target_table) * optimizer.estimate_range_selectivity(column_statistics, index_key)
+    except (TypeError, ValueError, ZeroDivisionError):
+        # Deal with bounds that cannot be compared to the values of the attribute
+        return len(target_table) * optimizer.DEFAULT_SELECTIVITY
+
+'''
+Method which finds the rows of a table satisfying the condition of a select operation
+Parameters: target_table - table the select operation is performed on
+            condition - condition of the select operation
+            row_ids - row positions the search is restricted to (e.g rows kept by a previous select), None for the whole table
+Return: row positions satisfying the condition in ascending order
+'''
+def find_select_rows(target_table, condition, row_ids=None):
+    path = choose_select_path(target_table, condition, row_ids)
+    if metrics.enabled():
+        metrics.record("access_path", describe_select_path(target_table, path, row_ids))
+        metrics.record("index", describe_select_indexes(target_table, path))
+    if path.partitioned:
+        partition_row_ids = partitioned.select_rows(target_table, condition)
+        if partition_row_ids is not None:
+            return partition_row_ids
+    relop_evals = [compile_select_relop_expr(cond, target_table) for cond in path.conditions]
+    if path.logop == "or":
+        return target_table.select_or_rows(relop_evals, path.index_attrs, path.index_keys, row_ids)
+    index_attr = path.index_attrs[0] if path.index_attrs is not None else None
+    index_key = path.index_keys[0] if path.index_keys is not None else None
+    if path.logop == "and":
+        return target_table.select_and_rows(relop_evals, index_attr, index_key, row_ids)
+    return target_table.select_rows(relop_evals[0], index_attr, index_key, row_ids)
+
+'''
+Method which describes the indexes used by the access path of a select operation
+Parameters: target_table - table the select operation is performed on
+            path - access path of the select operation
+Return: text listing the indexes (e.g "qty (hash)"), None if no index is used
+'''
+def describe_select_indexes(target_table, path):
+    if path.index_attrs is None:
+        return None
+    descriptions = []
+    for attr, key in zip(path.index_attrs, path.index_keys):
+        # Equality lookups use the hash index when there is one
+        kind = "hash" if not isinstance(key, KeyRange) and target_table.get_index(attr, "hash") is not None else "btree"
+        descriptions.append("{0} ({1})".format(attr, kind))
+    return ", ".join(descriptions)
+
+'''
+Method which describes the key values looked up with an index
+Parameters: attr - attribute with index
+            key - index key value or KeyRange
+Return: text of the lookup (e.g qty = 30 or 50 < time <= 80)
+'''
+def describe_index_key(attr, key):
+    if not isinstance(key, KeyRange):
+        return "{0} = {1!r}".format(attr, key)
+    text = attr
+    if key.low is not None:
+        text = "{0!r} {1} {2}".format(key.low, "<" if key.exclude_low else "<=", text)
+    if key.high is not None:
+        text = "{0} {1} {2!r}".format(text, "<" if key.exclude_high else "<=", key.high)
+    return text
+
+'''
+Method which describes the access path of a select operation
+Parameters: target_table - table the select operation is performed on
+            path - access path of the select operation
+            row_ids - row positions the search is restricted to, None for the whole table
+Return: text describing how the rows are found
+'''
+def describe_select_path(target_table, path, row_ids=None):
+    num_conditions = "{0} condition{1}".format(len(path.conditions), "s" if len(path.conditions) > 1 else "")
+    if path.logop is not None:
+        num_conditions += " separated by " + path.logop
+    if path.logop == "and" and path.estimated_rows is not None:
+        num_conditions += " (checked in the order {0})".format(", ".join(path.conditions))
+    estimate = ", estimated {0:.0f} result rows".format(path.estimated_rows) if path.estimated_rows is not None else ""
+    if path.index_attrs is None:
+        num_rows = len(target_table) if row_ids is None else len(row_ids)
+        if path.partitioned:
+            return "partitioned scan of {0} rows across {1} workers, {2}{3}".format(num_rows, config.SCAN_WORKERS, num_conditions, estimate)
+        return "{0} of {1} rows, {2}{3}".format("full scan" if row_ids is None else "scan", num_rows, num_conditions, estimate)
+    lookups = ", ".join(describe_index_key(attr, key) for attr, key in zip(path.index_attrs, path.index_keys))
+    if path.logop == "or":
+        return "index lookup of every condition ({0}), rows merged{1}".format(lookups, estimate)
+    return "index lookup ({0}), then on the found rows {1}{2}".format(lookups, num_conditions, estimate)
+
+'''
+Method which finds the indexes that can answer a condition inside select operation
+Parameters: target_table - table the select operation is performed on
+            relop_expr - parsed condition
+Return: list of (attribute with index, index key value or KeyRange) candidates
+'''
+def find_select_index(target_table, relop_expr):
+    if relop_expr[1] == "=":
+        attr, value = get_select_equal_relop_attr_value(relop_expr)
+        if target_table.get_index(attr) is not None:
+            return [(attr, value)]
+    elif relop_expr[1] in MIRRORED_RELOP:
+        # Range conditions can be answered by a B-tree index
+        attr_range = get_select_range_relop_attr_range(relop_expr)
+        if attr_range is not None and target_table.get_index(attr_range[0], "btree") is not None:
+            return [attr_range]
+    return []
+
+'''
+Method which merges the range candidates on the same attribute of conditions separated by "and"
+(e.g (time > 50) and (time <= 80) is scanned as one range)
+Parameters: index_candidates - list of (attribute with index, index key value or KeyRange) candidates
+Return: list of candidates with at most one KeyRange per attribute
+'''
+def merge_select_ranges(index_candidates):
+    merged = []
+    ranges = {}
+    for attr, key in index_candidates:
+        if not isinstance(key, KeyRange):
+            merged.append((attr, key))
+        elif attr in ranges:
+            ranges[attr] = intersect_key_ranges(ranges[attr], key)
+        else:
+            ranges[attr] = key
+    merged.extend(ranges.items())
+    return merged
+
+'''
+Method which finds the indexes that can answer an equality condition inside join operation
+Parameters: target_table1 - the first table of the join
+            target_table2 - the second table of the join
+            relop_expr - parsed condition
+Return: list of (attribute with index, attribute whose value is the index key, rev_flag) candidates, where rev_flag
+        indicates that the index is on the second table
+'''
+def find_join_index(target_table1, target_table2, relop_expr):
+    candidates = []
+    if relop_expr[1] == "=" and (not is_arithop_expr(relop_expr[0])) and (not is_arithop_expr(relop_expr[2])):
+        attr1 = parse_attr(relop_expr[0])[1]
+        attr2 = parse_attr(relop_expr[2])[1]
+        if target_table1.get_index(attr1) is not None:
+            candidates.append((attr1, attr2, False))
+        if target_table2.get_index(attr2) is not None:
+            candidates.append((attr2, attr1, True))
+    return candidates
+
+'''
+Method which ranks an index candidate of a join: hash indexes first, then the fewest rows probing the index
+Parameters: target_table1 - the first table of the join
+            target_table2 - the second table of the join
+            candidate - (attribute with index, attribute whose value is the index key, rev_flag)
+Return: sortable cost of the candidate
+'''
+def join_index_cost(target_table1, target_table2, candidate):
+    index_attr, ref_attr, rev_flag = candidate
+    if rev_flag:
+        indexed_table, probe_table = target_table2, target_table1
+    else:
+        indexed_table, probe_table = target_table1, target_table2
+    return indexed_table.get_index(index_attr, "hash") is None, len(probe_table)
+
+'''
+Strategy of a join operation
+kind - "hash" (hash table built on the fly), "band" (sorted second table), "index" (index nested loop) or "nested loop"
+conditions - conditions of the join operation
+key_cond - condition whose two sides are the join keys of a hash or band join, None for the other kinds
+index - (attribute with index, attribute whose value is the index key, rev_flag) of an index join, None otherwise
+build_first - whether the hash table of a hash join is built on the first table (the smaller one)
+order_by_second - whether the result rows of a hash join are ordered by row of the second table first (the order of
+the index join it replaces)
+estimated_rows - estimated number of result rows, None if not estimated
+'''
+JoinStrategy = namedtuple("JoinStrategy", ["kind", "conditions", "key_cond", "index", "build_first", "order_by_second", "estimated_rows"])
+
+'''
+Method which chooses how a join operation is performed
+When one of the tables has at least optimizer.OPTIMIZER_MIN_ROWS rows, an available index is only used when probing it
+row by row is estimated to be cheaper than building a hash table on the fly
+Parameters: target_table1 - the first table of the join
+            target_table2 - the second table of the join
+            condition - condition of the join operation
+Return: strategy of the join operation
+'''
+def choose_join_strategy(target_table1, target_table2, condition):
+    if is_complex_expr(condition):
+        # Deal with multiple conditions
+        conditions, logops = parse_complex_expr(condition)
+        conjunctive = all(logop == "and" for logop in logops)
+    else:
+        conditions, conjunctive = [condition], True
+    equal_conds = []
+    band_conds = []
+    index_candidates = []
+    for cond in conditions:
+        relop_expr = parse_relop_expr(cond)
+        if relop_expr[1] in ("<", "<=", ">", ">="):
+            band_conds.append(cond)
+        if relop_expr[1] == "=":
+            equal_conds.append(cond)
+        # Find attribute with index inside equality condition
+        index_candidates.extend((candidate, cond) for candidate in find_join_index(target_table1, target_table2, relop_expr))
+    build_first = len(target_table1) < len(target_table2)
+    use_costs = max(len(target_table1), len(target_table2)) >= optimizer.OPTIMIZER_MIN_ROWS
+    if index_candidates:
+        # Use the best index over all equality conditions
+        index, index_cond = min(index_candidates, key=lambda candidate: join_index_cost(target_table1, target_table2, candidate[0]))
+        estimated_rows = estimate_join_rows(target_table1, target_table2, index_cond) if use_costs and conjunctive else None
+        if estimated_rows is None:
+            # Deal with joins the cost model cannot estimate: the index is used
+            return JoinStrategy("index", conditions, None, index, build_first, False, None)
+        num_probe_rows = len(target_table1) if index[2] else len(target_table2)
+        if optimizer.index_join_cost(num_probe_rows, estimated_rows) <= optimizer.hash_join_cost(len(target_table1), len(target_table2), estimated_rows):
+            return JoinStrategy("index", conditions, None, index, build_first, False, estimated_rows)
+        # The index join probes the index with every row of the other table, so its result rows are in that order
+        return JoinStrategy("hash", conditions, index_cond, None, build_first, not index[2], estimated_rows)
+    if equal_conds and conjunctive:
+        # No index available: join on the first equality condition with a hash table built on the fly
+        estimated_rows = estimate_join_rows(target_table1, target_table2, equal_conds[0]) if use_costs else None
+        return JoinStrategy("hash", conditions, equal_conds[0], None, build_first, False, estimated_rows)
+    if band_conds and conjunctive:
+        # No equality condition: join on the first inequality condition by sorting the second table
+        return JoinStrategy("band", conditions, band_conds[0], None, build_first, False, None)
+    return JoinStrategy("nested loop", conditions, None, None, build_first, False, None)
+
+'''
+Method which estimates the number of result rows of a join on an equality condition from the statistics of the tables
+Parameters: target_table1 - the first table of the join
+            target_table2 - the second table of the join
+            equal_cond - equality condition
+Return: estimated number of rows, None if a side of the condition is not an attribute or has no statistics
+'''
+def estimate_join_rows(target_table1, target_table2, equal_cond):
+    relop_expr = parse_relop_expr(equal_cond)
+    if is_arithop_expr(relop_expr[0]) or is_arithop_expr(relop_expr[2]):
+        return None
+    statistics1 = target_table1.get_statistics(parse_attr(relop_expr[0])[1])
+    statistics2 = target_table2.get_statistics(parse_attr(relop_expr[2])[1])
+    if statistics1 is None or statistics2 is None:
+        return None
+    return optimizer.estimate_join_rows(statistics1, statistics2)
+
+'''
+Method which describes the strategy of a join operation
+Parameters: target_table1 - the first table of the join
+            target_table2 - the second table of the join
+            target_table1_name - name of the first table
+            target_table2_name - name of the second table
+            strategy - strategy of the join operation
+Return: text describing how the join is performed
+'''
+def describe_join_strategy(target_table1, target_table2, target_table1_name, target_table2_name, strategy):
+    num_others = len(strategy.conditions) - 1
+    others = ", then {0} other condition{1} checked on the pairs".format(num_others, "s" if num_others > 1 else "") if num_others else ""
+    if strategy.estimated_rows is not None:
+        others += ", estimated {0:.0f} result rows".format(strategy.estimated_rows)
+    if strategy.kind == "hash":
+        if strategy.build_first:
+            build, probe = (target_table1_name, target_table1), (target_table2_name, target_table2)
+        else:
+            build, probe = (target_table2_name, target_table2), (target_table1_name, target_table1)
+        return "hash join on {0}, hash table built on {1} ({2} rows) and probed with {3} ({4} rows){5}".format(
+            strategy.key_cond, build[0], len(build[1]), probe[0], len(probe[1]), others)
+    if strategy.kind == "band":
+        return "band join on {0}, {1} ({2} rows) sorted and searched for each of the {3} rows of {4}{5}".format(
+            strategy.key_cond, target_table2_name, len(target_table2), len(target_table1), target_table1_name, others)
+    if strategy.kind == "index":
+        index_attr, ref_attr, rev_flag = strategy.index
+        if rev_flag:
+            indexed, probe = (target_table2_name, target_table2), (target_table1_name, target_table1)
+        else:
+            indexed, probe = (target_table1_name, target_table1), (target_table2_name, target_table2)
+        kind = "hash" if indexed[1].get_index(index_attr, "hash") is not None else "btree"
+        # A single condition is answered by the index, several conditions are all checked on the found pairs
+        checked = ", then {0} conditions checked on the pairs".format(len(strategy.conditions)) if len(strategy.conditions) > 1 else ""
+        if strategy.estimated_rows is not None:
+            checked += ", estimated {0:.0f} result rows".format(strategy.estimated_rows)
+        return "index nested loop join, {0} index on {1}.{2} probed with {3}.{4} ({5} rows){6}".format(
+            kind, indexed[0], index_attr, probe[0], ref_attr, len(probe[1]), checked)
+    return "nested loop join, {0} conditions checked on {1} x {2} pairs".format(len(strategy.conditions), len(target_table1), len(target_table2))
+
+'''
+Method which describes the index used by the strategy of a join operation
+Parameters: target_table1 - the first table of the join
+            target_table2 - the second table of the join
+            target_table1_name - name of the first table
+            target_table2_name - name of the second table
+            strategy - strategy of the join operation
+Return: text of the index (e.g S.saleid (hash)), None if no index is used
+'''
+def describe_join_index(target_table1, target_table2, target_table1_name, target_table2_name, strategy):
+    if strategy.index is None:
+        return None
+    index_attr, ref_attr, rev_flag = strategy.index
+    indexed_table_name, indexed_table = (target_table2_name, target_table2) if rev_flag else (target_table1_name, target_table1)
+    kind = "hash" if indexed_table.get_index(index_attr, "hash") is not None else "btree"
+    return "{0}.{1} ({2})".format(indexed_table_name, index_attr, kind)
 
 '''
 Method which processes join operation
@@ -74,57 +462,65 @@ def process_join(op_name, result_table_name, params, tables):
     target_table2_name = params[1]
     target_table1 = tables[target_table1_name]
     target_table2 = tables[target_table2_name]
-    index_attr = None
-    ref_attr = None
-    rev_flag = False
-    if is_complex_expr(params[2]):
-        # Deal with multiple conditions
-        conditions, logops = parse_complex_expr(params[2])
-        relop_evals = []
-        for cond in conditions:
-            relop_eval = evaluate_join_relop_expr(cond)
-            relop_evals.append(relop_eval)
-            relop_expr = parse_relop_expr(cond)
-            # Find attribute with index inside equality condition
-            if relop_expr[1] == "=":
-                if (not is_arithop_expr(relop_expr[0])) and (not is_arithop_expr(relop_expr[2])):
-                    attr1 = parse_attr(relop_expr[0])[1]
-                    attr2 = parse_attr(relop_expr[2])[1]
-                    if attr1 in target_table1.attr_with_hash_index or attr1 in target_table1.attr_with_btree_index:
-                        index_attr = attr1
-                        ref_attr = attr2
-                    elif attr2 in target_table2.attr_with_hash_index or attr2 in target_table2.attr_with_btree_index:
-                        index_attr = attr2
-                        ref_attr = attr1
-                        rev_flag = True
-        if rev_flag:
-            result_table = target_table2.join_and(target_table1, relop_evals, target_table1_name, target_table2_name, index_attr, ref_attr, rev_flag)
-        else:
-            result_table = target_table1.join_and(target_table2, relop_evals, target_table1_name, target_table2_name, index_attr, ref_attr, rev_flag)
+    strategy = choose_join_strategy(target_table1, target_table2, params[2])
+    if metrics.enabled():
+        metrics.record("access_path", describe_join_strategy(target_table1, target_table2, target_table1_name, target_table2_name, strategy))
+        metrics.record("index", describe_join_index(target_table1, target_table2, target_table1_name, target_table2_name, strategy))
+    other_conds = [cond for cond in strategy.conditions if cond != strategy.key_cond]
+    if strategy.kind == "hash":
+        result_table = hash_join_tables(target_table1, target_table2, target_table1_name, target_table2_name, strategy.key_cond, other_conds,
+                                        strategy.build_first, strategy.order_by_second)
+    elif strategy.kind == "band":
+        result_table = band_join_tables(target_table1, target_table2, target_table1_name, target_table2_name, strategy.key_cond, other_conds)
     else:
-        # Deal with single condition
-        condition = params[2]
-        relop_eval = evaluate_join_relop_expr(condition)
-        relop_expr = parse_relop_expr(condition)
-        # Find attribute with index inside equality condition
-        if relop_expr[1] == "=":
-            if (not is_arithop_expr(relop_expr[0])) and (not is_arithop_expr(relop_expr[2])):
-                attr1 = parse_attr(relop_expr[0])[1]
-                attr2 = parse_attr(relop_expr[2])[1]
-                if attr1 in target_table1.attr_with_hash_index or attr1 in target_table1.attr_with_btree_index:
-                    index_attr = attr1
-                    ref_attr = attr2
-                elif attr2 in target_table2.attr_with_hash_index or attr2 in target_table2.attr_with_btree_index:
-                    index_attr = attr2
-                    ref_attr = attr1
-                    rev_flag = True
+        relop_evals = [compile_join_relop_expr(cond, target_table1, target_table2) for cond in strategy.conditions]
+        index_attr, ref_attr, rev_flag = strategy.index if strategy.index is not None else (None, None, False)
         if rev_flag:
-            result_table = target_table2.join(target_table1, relop_eval, target_table1_name, target_table2_name, index_attr, ref_attr, rev_flag)
+            join_table1, join_table2 = target_table2, target_table1
+        else:
+            join_table1, join_table2 = target_table1, target_table2
+        if len(relop_evals) > 1:
+            result_table = join_table1.join_and(join_table2, relop_evals, target_table1_name, target_table2_name, index_attr, ref_attr, rev_flag)
         else:
-            result_table = target_table1.join(target_table2, relop_eval, target_table1_name, target_table2_name, index_attr, ref_attr, rev_flag)
+            result_table = join_table1.join(join_table2, relop_evals[0], target_table1_name, target_table2_name, index_attr, ref_attr, rev_flag)
     tables[result_table_name] = result_table
     output_operation_result(op_name, result_table_name, result_table)
 
+'''
+Method which joins two tables on an equality condition with a hash table built on the fly
+Parameters: target_table1 - the first table that needs to be joined
+            target_table2 - the second table that needs to be joined
+            target_table1_name - name of the first table
+            target_table2_name - name of the second table
+            equal_cond - equality condition whose two sides are used as join keys
+            other_conds - remaining conditions checked on the pairs of rows with equal join keys
+            build_first - whether the hash table is built on the first table
+            order_by_second - whether the result rows are ordered by row of the second table first
+Return: a result table satisfying join conditions
+'''
+def hash_join_tables(target_table1, target_table2, target_table1_name, target_table2_name, equal_cond, other_conds, build_first, order_by_second=False):
+    key1, key2 = compile_join_key_exprs(equal_cond, target_table1, target_table2)
+    pair_filters = [compile_join_pair_filter(cond, target_table1, target_table2) for cond in other_conds]
+    return target_table1.hash_join(target_table2, key1, key2, pair_filters, target_table1_name, target_table2_name, build_first, order_by_second)
+
+'''
+Method which joins two tables on an inequality condition (<, <=, >, >=) by sorting the second table on its side of
+the condition, so that the matching rows of every row of the first table are found with a binary search
+Parameters: target_table1 - the first table that needs to be joined
+            target_table2 - the second table that needs to be joined
+            target_table1_name - name of the first table
+            target_table2_name - name of the second table
+            band_cond - inequality condition used to find the matching rows
+            other_conds - remaining conditions checked on the matching pairs of rows
+Return: a result table satisfying join conditions
+'''
+def band_join_tables(target_table1, target_table2, target_table1_name, target_table2_name, band_cond, other_conds):
+    relop_expr = parse_relop_expr(band_cond)
+    key1 = compile_join_key_expr(relop_expr[0], target_table1)
+    key2 = compile_join_key_expr(relop_expr[2], target_table2)
+    pair_filters = [compile_join_pair_filter(cond, target_table1, target_table2) for cond in other_conds]
+    return target_table1.band_join(target_table2, key1, key2, relop_expr[1], pair_filters, target_table1_name, target_table2_name)
+
 '''
 Method which processes project operation
 Parameters: op_name - name of the operation
@@ -273,6 +669,73 @@ def process_movavg(op_name, result_table_name, params, tables):
     tables[result_table_name] = result_table
     output_operation_result(op_name, result_table_name, result_table)
 
+'''
+Method which processes movmin operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the calculated moving minimum results
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: generate a new table containing the calculated moving minimum results
+'''
+def process_movmin(op_name, result_table_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    movmin_attr = params[1]
+    movmin_range = int(params[2])
+    result_table = target_table.movmin(movmin_attr, movmin_range)
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
+'''
+Method which processes movmax operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the calculated moving maximum results
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: generate a new table containing the calculated moving maximum results
+'''
+def process_movmax(op_name, result_table_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    movmax_attr = params[1]
+    movmax_range = int(params[2])
+    result_table = target_table.movmin(movmax_attr, movmax_range, True)
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
+'''
+Method which processes movcount operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the moving count results
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: generate a new table containing the moving count results
+'''
+def process_movcount(op_name, result_table_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    movcount_attr = params[1]
+    movcount_range = int(params[2])
+    result_table = target_table.movcount(movcount_attr, movcount_range)
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
+'''
+Method which processes cumsum operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the calculated cumulative sum results
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: generate a new table containing the calculated cumulative sum results
+'''
+def process_cumsum(op_name, result_table_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    cumsum_attr = params[1]
+    result_table = target_table.cumsum(cumsum_attr)
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
 '''
 Method which processes sort operation
 Parameters: op_name - name of the operation
@@ -284,8 +747,27 @@ Result: generate a new table containing the sorted data results
 def process_sort(op_name, result_table_name, params, tables):
     target_table_name = params[0]
     target_table = tables[target_table_name]
-    sort_attrs = params[1:]
-    result_table = target_table.sort(sort_attrs)
+    sort_attrs, descending, limit = parse_sort_params(params[1:])
+    result_table = target_table.sort(sort_attrs, descending, limit)
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
+'''
+Method which processes topk operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the first rows of the sorted table
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: generate a new table containing the first k rows of the table sorted by the given attributes
+'''
+def process_topk(op_name, result_table_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    if len(params) < 3 or not params[1].isdigit():
+        raise ValueError("topk needs a table, a number of rows and at least one attribute: {0}".format(", ".join(params)))
+    sort_attrs, descending, limit = parse_sort_params(params[2:])
+    k = int(params[1]) if limit is None else min(int(params[1]), limit)
+    result_table = target_table.sort(sort_attrs, descending, k)
     tables[result_table_name] = result_table
     output_operation_result(op_name, result_table_name, result_table)
 
@@ -330,6 +812,37 @@ def process_outputtofile(op_name, params, tables):
     file_name = params[1]
     target_table.output_to_file(file_name)
 
+'''
+Method which processes savetable operation
+Parameters: op_name - name of the operation
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: save the table with its indexes to a binary snapshot file
+'''
+def process_savetable(op_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    file_name = params[1]
+    target_table.save_snapshot(file_name)
+
+'''
+Method which processes loadtable operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that needs to be filled with data from the snapshot file
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: generate a new table (with its indexes) with the given table name
+'''
+def process_loadtable(op_name, result_table_name, params, tables):
+    file_name = params[0]
+    start_time = time.perf_counter()
+    result_table = Table()
+    result_table.load_snapshot(file_name)
+    load_time = time.perf_counter() - start_time
+    print("Rows Loaded: ", len(result_table), "({0:.0f} rows/sec)".format(len(result_table) / load_time if load_time > 0 else 0))
+    tables[result_table_name] = result_table
+    output_operation_result(op_name, result_table_name, result_table)
+
 '''
 Method which processes Hash operation
 Parameters: op_name - name of the operation
@@ -357,12 +870,75 @@ def process_Btree(op_name, params, tables):
     target_table.create_btree_index(attr)
 
 '''
-Method which preprocesses the input query, extracts the operation name and calls the corresponding operation process method
-Parameters: query - input query
+Method which processes analyze operation
+Parameters: op_name - name of the operation
+            params - parameters of the operation
             tables - a dictionary that stores all the created tables
-Result: call different operation process methods to deal with different operations
+Result: compute the exact statistics of every attribute of a table (used to choose access paths) and print them
 '''
-def process_input_query(query, tables):
+def process_analyze(op_name, params, tables):
+    target_table_name = params[0]
+    target_table = tables[target_table_name]
+    statistics = target_table.analyze()
+    print("Table Statistics: ", target_table_name, "({0} rows)".format(len(target_table)))
+    for attr, column_statistics in statistics.items():
+        if column_statistics.histogram is None:
+            print("Attribute: {0}  Distinct: {1}  (values of different types, not ordered)".format(attr, column_statistics.num_distinct))
+            continue
+        print("Attribute: {0}  Distinct: {1}  Min: {2}  Max: {3}  Histogram: {4}".format(
+            attr, column_statistics.num_distinct, column_statistics.min, column_statistics.max, " ".join(map(str, column_statistics.histogram))))
+
+'''
+Method which processes explain operation
+Parameters: op_name - name of the operation
+            params - parameters of the operation (the explained query)
+            tables - a dictionary that stores all the created tables
+Result: print the access path (or join strategy) the explained query would use, without executing it
+'''
+def process_explain(op_name, params, tables):
+    query = params[0]
+    explained_op_name, result_table_name, explained_params = parse_query(query)
+    index_description = None
+    if explained_op_name == "select":
+        base_table, row_ids, _ = tables[explained_params[0]].view_parts()
+        path = choose_select_path(base_table, explained_params[1], row_ids)
+        access_path = "{0}: {1}".format(explained_params[0], describe_select_path(base_table, path, row_ids))
+        index_description = describe_select_indexes(base_table, path)
+    elif explained_op_name == "join":
+        target_table1 = tables[explained_params[0]]
+        target_table2 = tables[explained_params[1]]
+        strategy = choose_join_strategy(target_table1, target_table2, explained_params[2])
+        access_path = describe_join_strategy(target_table1, target_table2, explained_params[0], explained_params[1], strategy)
+        index_description = describe_join_index(target_table1, target_table2, explained_params[0], explained_params[1], strategy)
+    elif explained_op_name in ("inputfromfile", "loadtable"):
+        access_path = "read of file {0}.{1}".format(explained_params[0], "txt" if explained_op_name == "inputfromfile" else "tbl")
+    elif explained_op_name == "analyze":
+        access_path = "full scan of {0} ({1} rows)".format(explained_params[0], len(tables[explained_params[0]]))
+    elif explained_op_name in ("Hash", "Btree"):
+        access_path = "{0} index build on {1}.{2} ({3} rows)".format(explained_op_name.lower(), explained_params[0], explained_params[1], len(tables[explained_params[0]]))
+    elif explained_op_name == "concat":
+        access_path = "full scan of {0} ({1} rows) and {2} ({3} rows)".format(explained_params[0], len(tables[explained_params[0]]), explained_params[1], len(tables[explained_params[1]]))
+    elif explained_op_name == "explain":
+        access_path = "none (explain does not read tables)"
+    else:
+        access_path = "full scan of {0} ({1} rows)".format(explained_params[0], len(tables[explained_params[0]]))
+    print("Explain: ", query)
+    print("Access Path: ", access_path)
+    print("Index Used: ", index_description if index_description is not None else "none")
+    if cache.enabled():
+        cache_key = cache.make_key(explained_op_name, explained_params, tables)
+        print("Result Cache: ", "hit" if cache_key in cache.entries else "miss" if cache_key is not None else "not cached")
+
+'''
+Method which splits the input query into its operation name, result table name and parameters
+Parameters: query - input query
+Return: operation name, result table name (None for operations without result table) and list of parameters
+'''
+def parse_query(query):
+    if re.match(r"explain\s*\(", query):
+        # Deal with explain: its only parameter is the explained query
+        return "explain", None, [query[query.index("(")+1:query.rindex(")")].strip()]
+    result_table_name = None
     # Get operation name
     if ':=' in query:
         op_name = query[query.index(":=")+2:query.index("(")].strip()
@@ -373,6 +949,79 @@ def process_input_query(query, tables):
     # Get and split parameters
     params = query[query.index("(")+1:query.rindex(")")].strip().split(",")
     params = [p.strip() for p in params]
+    return op_name, result_table_name, params
+
+'''
+Method which preprocesses the input query, extracts the operation name and calls the corresponding operation process method
+Parameters: query - input query
+            tables - a dictionary that stores all the created tables
+Result: call different operation process methods to deal with different operations
+'''
+def process_input_query(query, tables):
+    op_name, result_table_name, params = parse_query(query)
+    process_operation(op_name, result_table_name, params, tables)
+
+'''
+Method which processes an operation, adding its metrics to the run report when the metrics are collected
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the result (None for operations without result table)
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: call the process method of the operation (or reuse its cached result)
+'''
+def process_operation(op_name, result_table_name, params, tables):
+    if metrics.enabled():
+        metrics.measure_operation(op_name, result_table_name, params, tables, run_operation)
+    else:
+        run_operation(op_name, result_table_name, params, tables)
+
+'''
+Method which runs an operation, reusing its cached result when the result cache is used
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the result (None for operations without result table)
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: call the process method of the operation (or reuse its cached result)
+'''
+def run_operation(op_name, result_table_name, params, tables):
+    if not cache.enabled():
+        dispatch_operation(op_name, result_table_name, params, tables)
+        return
+    previous_table = tables.get(result_table_name)
+    indexed_table = tables.get(params[0]) if op_name in ("Hash", "Btree") else None
+    cache_key = cache.make_key(op_name, params, tables)
+    result_table = cache.lookup(cache_key) if cache_key is not None else None
+    if result_table is not None:
+        metrics.record("access_path", "result cache hit")
+        tables[result_table_name] = result_table
+        output_operation_result(op_name, result_table_name, result_table)
+    else:
+        indexed_version = indexed_table.version if indexed_table is not None else None
+        dispatch_operation(op_name, result_table_name, params, tables)
+        result_table = tables.get(result_table_name)
+        if result_table is not None and result_table is not previous_table:
+            version = cache.result_version(op_name, params, cache_key)
+            if version is not None:
+                result_table.version = version
+            if cache_key is not None:
+                cache.store(cache_key, result_table)
+        if indexed_table is not None:
+            indexed_table.version = cache.derive_version((op_name, indexed_version, params[1]))
+            # Results computed from a re-indexed table can no longer be reused
+            cache.release_version(indexed_version, tables)
+    # Results computed from a replaced table can no longer be reused
+    if previous_table is not None and tables.get(result_table_name) is not previous_table:
+        cache.release_version(previous_table.version, tables)
+
+'''
+Method which calls the process method of an operation
+Parameters: op_name - name of the operation
+            result_table_name - name of the table that stores the result (None for operations without result table)
+            params - parameters of the operation
+            tables - a dictionary that stores all the created tables
+Result: call different operation process methods to deal with different operations
+'''
+def dispatch_operation(op_name, result_table_name, params, tables):
     # Find the corresponding operation process method
     if op_name == "inputfromfile":
         process_inputfromfile(op_name, result_table_name, params, tables)
@@ -398,16 +1047,34 @@ def process_input_query(query, tables):
         process_movsum(op_name, result_table_name, params, tables)
     elif op_name == "movavg":
         process_movavg(op_name, result_table_name, params, tables)
+    elif op_name == "movmin":
+        process_movmin(op_name, result_table_name, params, tables)
+    elif op_name == "movmax":
+        process_movmax(op_name, result_table_name, params, tables)
+    elif op_name == "movcount":
+        process_movcount(op_name, result_table_name, params, tables)
+    elif op_name == "cumsum":
+        process_cumsum(op_name, result_table_name, params, tables)
     elif op_name == "sort":
         process_sort(op_name, result_table_name, params, tables)
+    elif op_name == "topk":
+        process_topk(op_name, result_table_name, params, tables)
     elif op_name == "concat":
         process_concat(op_name, result_table_name, params, tables)
     elif op_name == "outputtofile":
         process_outputtofile(op_name, params, tables)
+    elif op_name == "savetable":
+        process_savetable(op_name, params, tables)
+    elif op_name == "loadtable":
+        process_loadtable(op_name, result_table_name, params, tables)
     elif op_name == "Hash":
         process_Hash(op_name, params, tables)
     elif op_name == "Btree":
         process_Btree(op_name, params, tables)
+    elif op_name == "explain":
+        process_explain(op_name, params, tables)
+    elif op_name == "analyze":
+        process_analyze(op_name, params, tables)
     else:
         raise ValueError("Operation Not Found")
 
@@ -0,0 +1,150 @@
+import io
+import multiprocessing
+import time
+from contextlib import redirect_stdout
+import config
+import metrics
+import utils
+from process import parse_query, process_operation
+from planner import get_input_table_names, INDEX_OPERATIONS
+
+'''
+Parallel execution of a query file (main.py --workers N)
+Every query waits for the queries creating (or indexing) its input tables, and a query redefining (or indexing) a
+table also waits for the earlier queries reading that table. Queries are run in waves: all queries whose dependencies
+are done run at the same time on a pool of forked worker processes, which see the tables of the main process without
+copying them. The workers send back the result tables, their logged results and printed messages, which the main
+process writes in the order of the queries
+'''
+
+'''
+Tables of the main process at the start of a wave, inherited by the forked workers
+'''
+wave_tables = {}
+
+'''
+Method which checks whether worker processes can be forked on the current platform
+Return: boolean value
+'''
+def parallel_available():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+'''
+Method which finds the wave of every query of a query file
+Parameters: queries - parsed queries: (query, op_name, result_table_name, params)
+Return: wave number of every query (queries of the same wave are independent)
+'''
+def schedule_queries(queries):
+    waves = []
+    # Last query creating or indexing every table and queries reading it since its creation
+    writers = {}
+    readers = {}
+    for position, (query, op_name, result_table_name, params) in enumerate(queries):
+        dependencies = []
+        for name in get_input_table_names(op_name, params):
+            if name in writers:
+                dependencies.append(writers[name])
+        if op_name in INDEX_OPERATIONS:
+            # Earlier queries reading the table must not see its new index (they could choose another strategy)
+            dependencies.extend(readers.get(params[0], []))
+            writers[params[0]] = position
+        if result_table_name is not None:
+            # The previous table with the same name must not be replaced while it is still read
+            if result_table_name in writers:
+                dependencies.append(writers[result_table_name])
+            dependencies.extend(readers.get(result_table_name, []))
+            readers[result_table_name] = []
+        for name in get_input_table_names(op_name, params):
+            readers.setdefault(name, []).append(position)
+        if result_table_name is not None:
+            writers[result_table_name] = position
+        waves.append(1 + max((waves[dependency] for dependency in dependencies), default=-1))
+    return waves
+
+'''
+Method which runs a query, collecting its logged results and printed messages
+Parameters: query - parsed query: (query, op_name, result_table_name, params)
+            tables - a dictionary that stores all the created tables
+Return: (result table or None, logged results, printed messages, execution time, raised exception or None, entries
+        of the run report)
+'''
+def run_query(query, tables):
+    query, op_name, result_table_name, params = query
+    report_start = len(metrics.report)
+    utils.log_buffer = []
+    output = io.StringIO()
+    error = None
+    start_time = time.time()
+    try:
+        with redirect_stdout(output):
+            process_operation(op_name, result_table_name, params, tables)
+    except Exception as e:
+        error = e
+    execution_time = time.time() - start_time
+    log, utils.log_buffer = utils.log_buffer, None
+    # The entries are added to the run report of the main process in the order of the queries
+    report = metrics.report[report_start:]
+    del metrics.report[report_start:]
+    result_table = tables.get(result_table_name) if result_table_name is not None and error is None else None
+    return result_table, log, output.getvalue(), execution_time, error, report
+
+'''
+Method which runs a query inside a worker process on the tables inherited from the main process
+Parameters: query - parsed query: (query, op_name, result_table_name, params)
+Return: same as run_query
+'''
+def run_worker_query(query):
+    # The worker gets its own dictionary, so the result does not replace the table seen by other queries
+    return run_query(query, dict(wave_tables))
+
+'''
+Method which executes a query file with independent queries running in worker processes
+Parameters: queries - input queries
+            tables - a dictionary that stores all the created tables
+Return: iterator over (query, printed messages, execution time) in the order of the queries
+'''
+def execute_parallel(queries, tables):
+    global wave_tables
+    queries = [query.strip() for query in queries]
+    queries = [(query,) + parse_query(query) for query in queries if query]
+    waves = schedule_queries(queries)
+    results = [None] * len(queries)
+    next_position = 0
+    context = multiprocessing.get_context("fork")
+    for wave in range(max(waves, default=-1) + 1):
+        positions = [position for position in range(len(queries)) if waves[position] == wave]
+        # Index creation and analyze change the tables of the main process, so they are never run by a worker
+        local_positions = [position for position in positions if queries[position][1] in INDEX_OPERATIONS]
+        worker_positions = [position for position in positions if position not in local_positions]
+        if len(worker_positions) == 1:
+            local_positions = positions
+            worker_positions = []
+        pending = []
+        if worker_positions:
+            wave_tables = tables
+            pool = context.Pool(min(config.WORKERS, len(worker_positions)))
+            pending = [(position, pool.apply_async(run_worker_query, (queries[position],))) for position in worker_positions]
+            pool.close()
+        for position in local_positions:
+            results[position] = run_query(queries[position], tables)
+        for position, result in pending:
+            results[position] = result.get()
+        if worker_positions:
+            pool.join()
+            wave_tables = {}
+        for position in positions:
+            result_table_name = queries[position][2]
+            if results[position][0] is not None:
+                tables[result_table_name] = results[position][0]
+        # Deal with the queries whose previous queries are all done, in the order of the query file
+        while next_position < len(queries) and results[next_position] is not None:
+            result_table, log, output, execution_time, error, report = results[next_position]
+            if log:
+                utils.write_operation_log("".join(log))
+            metrics.report.extend(report)
+            if error is not None:
+                print(output, end="")
+                raise error
+            yield queries[next_position][0], output, execution_time
+            results[next_position] = True
+            next_position += 1
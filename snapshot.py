@@ -0,0 +1,124 @@
+import json
+import mmap
+import pickle
+import struct
+from array import array
+from itertools import accumulate
+
+'''
+Binary snapshot format of a table, written by savetable and read back by loadtable
+Layout: magic bytes, length of the metadata, metadata (JSON), then the data blocks aligned to 8 bytes
+Metadata: header, row count, block of every column and the key/count/row position blocks of every index
+Block kinds: "q"/"d" - raw bytes of a typed array (other typecodes are used by the runs spilled by sorts)
+             "str" - UTF-8 text of string values separated by new lines
+             "pickle" - any other list of values (e.g mixed types, strings containing new lines)
+'''
+SNAPSHOT_MAGIC = b"MRDBSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PREFIX = struct.Struct("<8sIQ")
+
+'''
+Method which encodes a column as a snapshot data block
+Parameters: column - typed array or list of attribute values
+Return: block kind and the bytes of the block
+'''
+def encode_column(column):
+    if isinstance(column, array):
+        return column.typecode, column.tobytes()
+    if all(type(value) is str for value in column):
+        text = "\n".join(column)
+        # Strings containing the separator cannot be split back
+        if text.count("\n") == max(len(column) - 1, 0):
+            return "str", text.encode("utf-8")
+    return "pickle", pickle.dumps(list(column), protocol=pickle.HIGHEST_PROTOCOL)
+
+'''
+Method which decodes a snapshot data block back to a column
+Parameters: buffer - memory mapped snapshot file
+            block - metadata of the block (kind, offset, length)
+            num_values - number of values of the block
+Return: typed array or list of attribute values
+'''
+def decode_column(buffer, block, num_values):
+    data = buffer[block["offset"]:block["offset"] + block["length"]]
+    # Typed arrays (e.g the codes of encoded columns spilled by sorts) have one letter kinds
+    if len(block["kind"]) == 1:
+        column = array(block["kind"])
+        column.frombytes(data)
+        return column
+    if block["kind"] == "str":
+        return bytes(data).decode("utf-8").split("\n") if num_values else []
+    return pickle.loads(data)
+
+'''
+Method which writes a table to a snapshot file
+Parameters: file_name - name of the snapshot file
+            header - attribute names of the table
+            columns - columns of the table
+            indexes - (attribute, kind) -> items (key, list of row positions) of every index
+Result: the snapshot file is created (or replaced)
+'''
+def write_snapshot(file_name, header, columns, indexes):
+    blocks = []
+    offset = 0
+    def add_block(kind, data):
+        nonlocal offset
+        blocks.append(data)
+        block = {"kind": kind, "offset": offset, "length": len(data)}
+        padding = -len(data) % 8
+        if padding:
+            blocks.append(b"\0" * padding)
+        offset += len(data) + padding
+        return block
+    metadata = {"header": header, "rows": len(columns[0]) if columns else 0, "columns": [], "indexes": []}
+    for column in columns:
+        metadata["columns"].append(add_block(*encode_column(column)))
+    for (attr, kind), items in indexes.items():
+        keys = [key for key, _ in items]
+        counts = array("q", [len(row_ids) for _, row_ids in items])
+        row_ids = array("q", [i for _, ids in items for i in ids])
+        # Index keys are encoded like the column they come from
+        key_column = array(columns[header.index(attr)].typecode, keys) if isinstance(columns[header.index(attr)], array) else keys
+        metadata["indexes"].append({
+            "attr": attr, "kind": kind, "size": len(keys),
+            "keys": add_block(*encode_column(key_column)),
+            "counts": add_block("q", counts.tobytes()),
+            "row_ids": add_block("q", row_ids.tobytes()),
+        })
+    metadata = json.dumps(metadata).encode("utf-8")
+    metadata += b" " * (-(SNAPSHOT_PREFIX.size + len(metadata)) % 8)
+    with open(file_name, "wb") as f:
+        f.write(SNAPSHOT_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(metadata)))
+        f.write(metadata)
+        for data in blocks:
+            f.write(data)
+
+'''
+Method which reads a table from a snapshot file through a memory map (the text is not parsed again)
+Parameters: file_name - name of the snapshot file
+Return: header, columns and (attribute, kind) -> items (key, list of row positions) of every index
+'''
+def read_snapshot(file_name):
+    with open(file_name, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if len(buffer) < SNAPSHOT_PREFIX.size:
+            raise ValueError("{0} is not a table snapshot".format(file_name))
+        magic, version, metadata_length = SNAPSHOT_PREFIX.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("{0} is not a table snapshot".format(file_name))
+        if version != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version {0} in {1}".format(version, file_name))
+        data_start = SNAPSHOT_PREFIX.size + metadata_length
+        metadata = json.loads(bytes(buffer[SNAPSHOT_PREFIX.size:data_start]).decode("utf-8"))
+        with memoryview(buffer) as view:
+            data = view[data_start:]
+            columns = [decode_column(data, block, metadata["rows"]) for block in metadata["columns"]]
+            indexes = {}
+            for index in metadata["indexes"]:
+                keys = decode_column(data, index["keys"], index["size"])
+                counts = decode_column(data, index["counts"], index["size"])
+                row_ids = decode_column(data, index["row_ids"], metadata["rows"]).tolist()
+                ends = list(accumulate(counts))
+                starts = [0] + ends[:-1]
+                indexes[(index["attr"], index["kind"])] = list(zip(keys, map(row_ids.__getitem__, map(slice, starts, ends))))
+            data.release()
+    return metadata["header"], columns, indexes
@@ -0,0 +1,194 @@
+import sys
+import weakref
+from array import array
+from heapq import merge
+from operator import itemgetter
+import config
+import metrics
+import spill
+
+'''
+Sort keys of the sort/topk operations and the external merge sort, used when config.SORT_MEMORY_BUDGET is greater
+than 0 and the keys of a sort would not fit into it
+The rows are sorted in runs of as many rows as fit into the budget. Every sorted run is spilled to a temporary file in
+blocks of row positions and keys (see spill.py).
+The runs are merged lazily, a block of every run at a time: written results stream the merged rows, and operations
+reading the result gather its row positions once
+'''
+
+'''
+Estimated memory used by every row of an in-memory sort besides its key: the slots of the key list, of the sorted
+order and of the result positions, and the position itself
+'''
+SORT_ROW_OVERHEAD = 3 * 8 + 28
+
+'''
+Number of rows whose keys are measured to estimate the memory used by the keys of a sort
+'''
+SORT_SAMPLE_SIZE = 100
+
+'''
+Maximum number of rows of a block of a spilled run (the unit read back while merging)
+'''
+RUN_BLOCK_ROWS = 4096
+
+'''
+Class represents sort keys ordered in descending order, for values that cannot be negated (e.g strings)
+'''
+class DescendingKey:
+    __slots__ = ("value",)
+    '''
+    Method which initializes the value of the current key
+    Parameters: value - attribute value
+    '''
+    def __init__(self, value):
+        self.value = value
+    '''
+    Method which checks whether the current key comes before another key (its value is greater)
+    Parameters: other - another key
+    Return: boolean value
+    '''
+    def __lt__(self, other):
+        return other.value < self.value
+    '''
+    Method which checks whether the current key has the same value as another key
+    Parameters: other - another key
+    Return: boolean value
+    '''
+    def __eq__(self, other):
+        return self.value == other.value
+
+'''
+Method which generates the sort keys of the given rows
+Parameters: key_columns - columns of the sort attributes (codes of encoded attributes), at least one
+            wrappers - function applied to the values of every attribute (e.g negation for descending order), None
+                       for ascending order
+            row_ids - row positions (a range of positions is read as a slice of the columns)
+Return: iterator over the keys (values of a single attribute, tuples otherwise)
+'''
+def sort_keys(key_columns, wrappers, row_ids):
+    key_values = []
+    for column, wrapper in zip(key_columns, wrappers):
+        if isinstance(row_ids, range) and row_ids.step == 1:
+            # Deal with consecutive rows: they are read as a slice of the column (the whole column is not copied)
+            values = iter(column if row_ids == range(len(column)) else column[row_ids.start:row_ids.stop])
+        else:
+            values = map(column.__getitem__, row_ids)
+        key_values.append(values if wrapper is None else map(wrapper, values))
+    return key_values[0] if len(key_values) == 1 else zip(*key_values)
+
+'''
+Method which checks whether sorts are bounded by a memory budget
+Return: boolean value
+'''
+def enabled():
+    return config.SORT_MEMORY_BUDGET > 0
+
+'''
+Method which estimates the memory used by an in-memory sort for every row
+Parameters: key_columns - columns of the sort attributes
+            wrappers - function applied to the values of every attribute, None for ascending order
+            row_ids - row positions that are sorted
+Return: estimated size in bytes
+'''
+def estimate_row_size(key_columns, wrappers, row_ids):
+    sample = list(sort_keys(key_columns, wrappers, row_ids[:SORT_SAMPLE_SIZE]))
+    if not sample:
+        return SORT_ROW_OVERHEAD
+    if len(key_columns) == 1:
+        key_size = sum(map(sys.getsizeof, sample))
+    else:
+        key_size = sum(sys.getsizeof(key) + sum(map(sys.getsizeof, key)) for key in sample)
+    return SORT_ROW_OVERHEAD + key_size // len(sample)
+
+'''
+Method which sorts rows with runs spilled to a temporary file when their keys do not fit into the memory budget
+Parameters: key_columns - columns of the sort attributes (codes of encoded attributes)
+            wrappers - function applied to the values of every attribute, None for ascending order
+            row_ids - row positions that are sorted
+Return: MergedRows generating the sorted row positions, None if the sort fits into the memory budget
+'''
+def external_sort(key_columns, wrappers, row_ids):
+    num_rows = len(row_ids)
+    run_rows = max(1, config.SORT_MEMORY_BUDGET // estimate_row_size(key_columns, wrappers, row_ids))
+    if num_rows <= run_rows:
+        return None
+    num_runs = -(-num_rows // run_rows)
+    # The merge reads one block of every run at a time, so the blocks of all runs fit into the budget together
+    block_rows = max(1, min(RUN_BLOCK_ROWS, run_rows // num_runs))
+    spill_file = spill.SpillFile("sort_run_")
+    runs = []
+    for start in range(0, num_rows, run_rows):
+        end = min(start + run_rows, num_rows)
+        keys = list(sort_keys(key_columns, wrappers, row_ids[start:end]))
+        order = sorted(range(end - start), key=keys.__getitem__)
+        del keys
+        run_row_ids = row_ids[start:end]
+        values = [[column[run_row_ids[i]] for i in order] for column in key_columns]
+        blocks = []
+        for block_start in range(0, len(order), block_rows):
+            block_end = min(block_start + block_rows, len(order))
+            # Positions inside the sorted rows break the ties of equal keys, which keeps the sort stable
+            columns = [array("q", [start + i for i in order[block_start:block_end]])]
+            for column, column_values in zip(key_columns, values):
+                columns.append(spill.typed_values(column, column_values[block_start:block_end]))
+            blocks.append(spill_file.write_block(columns))
+        runs.append(blocks)
+    spill_file.flush()
+    metrics.record("access_path", "external merge sort ({0} runs spilled to disk)".format(len(runs)))
+    return MergedRows(spill_file, runs, wrappers, row_ids)
+
+'''
+Class represents the sorted row positions of an external sort, merged from its spilled runs when they are read
+'''
+class MergedRows:
+    '''
+    Method which initializes instance variables of the current rows
+    Parameters: spill_file - SpillFile holding the runs
+                runs - blocks of every run
+                wrappers - function applied to the values of every attribute, None for ascending order
+                row_ids - row positions that were sorted
+    '''
+    def __init__(self, spill_file, runs, wrappers, row_ids):
+        self.spill_file = spill_file
+        self.runs = runs
+        self.wrappers = wrappers
+        self.row_ids = row_ids
+        self.merged_row_ids = None
+        # The temporary file has no name, so it is only closed when the runs are not needed anymore, not at exit
+        # (results may still be written by the log writer then)
+        weakref.finalize(self, spill_file.close).atexit = False
+    '''
+    Method which returns the number of sorted rows
+    Return: row count
+    '''
+    def __len__(self):
+        return len(self.row_ids)
+    '''
+    Method which merges the runs lazily (k-way merge of the next row of every run)
+    Return: iterator over the sorted row positions
+    '''
+    def __iter__(self):
+        if self.merged_row_ids is not None:
+            return iter(self.merged_row_ids)
+        merged = merge(*[self.read_run(blocks) for blocks in self.runs])
+        return map(self.row_ids.__getitem__, map(itemgetter(1), merged))
+    '''
+    Method which reads the sorted rows of a spilled run back, a block at a time
+    The reading generator refers to the current rows, so the runs are not deleted while they are merged
+    Parameters: blocks - (offset, length, number of rows, column blocks) of every block of the run
+    Return: iterator over (key, position) pairs in sorted order
+    '''
+    def read_run(self, blocks):
+        for block in blocks:
+            positions, *key_columns = self.spill_file.read_block(block)
+            yield from zip(sort_keys(key_columns, self.wrappers, range(len(positions))), positions)
+    '''
+    Method which gathers the sorted row positions once, when an operation needs them
+    The runs are kept until the current rows are garbage collected, since a written result may still be streaming them
+    Return: typed array of the sorted row positions
+    '''
+    def materialize(self):
+        if self.merged_row_ids is None:
+            self.merged_row_ids = array("q", iter(self))
+        return self.merged_row_ids
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from array import array
+import snapshot
+
+'''
+Temporary files of the operations spilling to disk when their data do not fit into their memory budget (the external
+merge sort and the Grace hash join)
+Data are written in blocks of columns encoded like the blocks of a snapshot: typed arrays (row positions and numeric
+values) and UTF-8 text (strings). The metadata of the blocks stay in memory, and every block is read back on its own
+'''
+
+'''
+Method which keeps the values gathered from a column in a column of the same kind, so that they are spilled compactly
+Parameters: column - typed array, list of attribute values or encoded column the values come from
+            values - list of values
+Return: typed array of the values for a typed array column, the list of values otherwise
+'''
+def typed_values(column, values):
+    if isinstance(column, array):
+        return array(column.typecode, values)
+    return values
+
+'''
+Class represents temporary files holding blocks of spilled columns (deleted when they are closed)
+'''
+class SpillFile:
+    '''
+    Method which creates the temporary file
+    Parameters: prefix - prefix of the name of the file
+    '''
+    def __init__(self, prefix):
+        self.file = tempfile.TemporaryFile(prefix=prefix)
+        self.size = 0
+    '''
+    Method which appends a block to the current file
+    Parameters: columns - typed arrays or lists of the same number of values
+    Return: (offset, length, number of values, column blocks) of the block
+    '''
+    def write_block(self, columns):
+        encoded = [snapshot.encode_column(column) for column in columns]
+        column_blocks = []
+        length = 0
+        for kind, data in encoded:
+            column_blocks.append({"kind": kind, "offset": length, "length": len(data)})
+            length += len(data)
+        self.file.write(b"".join(data for _, data in encoded))
+        block = (self.size, length, len(columns[0]), column_blocks)
+        self.size += length
+        return block
+    '''
+    Method which makes the written blocks readable
+    '''
+    def flush(self):
+        self.file.flush()
+    '''
+    Method which reads a block of the current file back
+    Parameters: block - (offset, length, number of values, column blocks) of the block
+    Return: list of the columns of the block
+    '''
+    def read_block(self, block):
+        offset, length, num_values, column_blocks = block
+        data = os.pread(self.file.fileno(), length, offset)
+        return [snapshot.decode_column(data, column_block, num_values) for column_block in column_blocks]
+    '''
+    Method which closes (and so deletes) the current file
+    '''
+    def close(self):
+        self.file.close()
@@ -1,5 +1,131 @@
 import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque, namedtuple
+from heapq import nsmallest
+from itertools import accumulate, count, islice, repeat
+from operator import itemgetter, neg
 from BTrees.OOBTree import OOBTree
+import encoding
+import joining
+import optimizer
+import partitioned
+import snapshot
+import sorting
+import vectorized
+
+'''
+Method which stores the values of one attribute as a column
+Parameters: values - list of attribute values
+Return: typed array for integer/float columns, list for string (or mixed) columns
+'''
+def make_column(values):
+    if values and all(type(value) is int for value in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            pass
+    elif values and all(type(value) is float for value in values):
+        return array("d", values)
+    return list(values)
+
+'''
+Method which gathers the values of a column at the given row positions
+Parameters: column - typed array, list of attribute values or encoded column
+            row_ids - row positions that need to be gathered
+Return: a new column of the same kind containing the gathered values
+'''
+def take_column(column, row_ids):
+    if isinstance(column, encoding.EncodedColumn):
+        return encoding.EncodedColumn(take_column(column.codes, row_ids), column.values)
+    values = [column[i] for i in row_ids]
+    if isinstance(column, array):
+        return array(column.typecode, values)
+    return values
+
+'''
+Method which creates a view selecting rows and attributes of a table, without copying their values
+Parameters: base_table - table holding the values (not a view itself)
+            row_ids - positions of the rows of the base table, in the order of the view
+            attr_indices - positions of the attributes of the base table, in the order of the view
+Return: a table whose columns are gathered from the base table only when they are needed
+'''
+def make_view(base_table, row_ids, attr_indices):
+    result_table = Table()
+    result_table.header = [base_table.header[i] for i in attr_indices]
+    result_table._data = None
+    result_table._view = (base_table, row_ids, list(attr_indices))
+    return result_table
+
+'''
+Method which converts row positions to a list
+Parameters: row_ids - row positions (list, range or NumPy array)
+Return: list of row positions
+'''
+def row_id_list(row_ids):
+    return row_ids.tolist() if hasattr(row_ids, "tolist") else list(row_ids)
+
+'''
+Method which concatenates two columns
+Parameters: column1 - typed array, list of attribute values or encoded column
+            column2 - typed array, list of attribute values or encoded column
+Return: a new column, of the kind make_column chooses for the values of both columns (encoded if both are)
+'''
+def concat_columns(column1, column2):
+    if isinstance(column1, array) and isinstance(column2, array) and column1.typecode == column2.typecode:
+        return column1 + column2
+    if isinstance(column1, encoding.EncodedColumn) and isinstance(column2, encoding.EncodedColumn):
+        return encoding.concat_columns(column1, column2)
+    return make_column(list(column1) + list(column2))
+
+'''
+Method which appends the values of a column to a column built by the current operation
+Parameters: column - typed array, list of attribute values or encoded column (modified in place)
+            values - column of the same kind (sharing the dictionary of an encoded column)
+'''
+def extend_column(column, values):
+    if isinstance(column, encoding.EncodedColumn):
+        column.codes.extend(values.codes)
+    else:
+        column.extend(values)
+
+'''
+Number of rows converted to strings at a time when a table is written
+'''
+LINE_BATCH_SIZE = 4096
+
+'''
+Size of the write buffer of files created by outputtofile
+'''
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+'''
+Range of index key values answered by a B-tree range scan, a None bound is unbounded
+'''
+KeyRange = namedtuple("KeyRange", ["low", "high", "exclude_low", "exclude_high"])
+
+'''
+Method which intersects two ranges of index key values (e.g time > 50 and time <= 80)
+Parameters: range1, range2 - KeyRange of each condition
+Return: KeyRange satisfying both conditions
+'''
+def intersect_key_ranges(range1, range2):
+    low, exclude_low = range1.low, range1.exclude_low
+    if range2.low is not None and (low is None or range2.low > low):
+        low, exclude_low = range2.low, range2.exclude_low
+    elif range2.low is not None and range2.low == low:
+        exclude_low = exclude_low or range2.exclude_low
+    high, exclude_high = range1.high, range1.exclude_high
+    if range2.high is not None and (high is None or range2.high < high):
+        high, exclude_high = range2.high, range2.exclude_high
+    elif range2.high is not None and range2.high == high:
+        exclude_high = exclude_high or range2.exclude_high
+    return KeyRange(low, high, exclude_low, exclude_high)
+
+'''
+Source of table versions, unique inside the current process
+'''
+table_versions = count(1)
 
 '''
 Class represents tables which contains operations on tables
@@ -10,30 +136,130 @@ class Table:
     '''
     def __init__(self):
         self.header = []
-        self.data = []
-        self.hash_structure = {}
-        self.btree = OOBTree()
-        self.attr_with_hash_index = {}
-        self.attr_with_btree_index = {}
+        self._data = []
+        self._columns = None
+        # (base table, row positions, attribute positions) of a view whose columns are not gathered yet, None otherwise
+        self._view = None
+        # Index catalog: (attribute, "hash"/"btree") -> index mapping attribute values to row positions
+        self.indexes = {}
+        # Statistics of the attributes: attribute -> ColumnStatistics, cleared whenever the rows change
+        self.statistics = {}
+        # Changed whenever the rows or indexes of the table change (used as key by the result cache)
+        self.version = next(table_versions)
     '''
     Method which converts the current table to string for output
     Return: string representation of the current table
     '''
     def __str__(self):
-        table_to_str = ""
-        for i, attr_name in enumerate(self.header):
-            table_to_str += attr_name
-            if i != len(self.header) - 1:
-                table_to_str += "|"
-        table_to_str += "\n"
-        for i, record in enumerate(self.data):
-            for j, attr_value in enumerate(record):
-                table_to_str += str(attr_value)
-                if j != len(record) - 1:
-                    table_to_str += "|"
-            if i != len(self.data):
-                table_to_str += "\n"
-        return table_to_str
+        return "\n".join(self.iter_lines()) + "\n"
+    '''
+    Method which generates the lines of the string representation of the current table, one at a time
+    Values are converted to strings a batch of rows at a time, column by column
+    Return: iterator over the header line and one line per row (without line breaks)
+    '''
+    def iter_lines(self):
+        yield "|".join(self.header)
+        if self._view is not None:
+            # Deal with a view: the values are read from its base table, a batch of rows at a time
+            base_table, row_ids, attr_indices = self._view
+            base_columns = [base_table.columns[i] for i in attr_indices]
+            if hasattr(row_ids, "tolist"):
+                batches = (row_ids[start:start + LINE_BATCH_SIZE].tolist() for start in range(0, len(row_ids), LINE_BATCH_SIZE))
+            else:
+                # Rows of an external sort are streamed from the merge of its runs
+                remaining = iter(row_ids)
+                batches = iter(lambda: list(islice(remaining, LINE_BATCH_SIZE)), [])
+            for batch_row_ids in batches:
+                values = [map(str, map(column.__getitem__, batch_row_ids)) for column in base_columns]
+                yield from map("|".join, zip(*values))
+            return
+        if self._columns is None:
+            for record in self._data:
+                yield "|".join(map(str, record))
+            return
+        for start in range(0, len(self), LINE_BATCH_SIZE):
+            values = [map(str, column[start:start + LINE_BATCH_SIZE]) for column in self._columns]
+            yield from map("|".join, zip(*values))
+    '''
+    Method which writes the string representation of the current table to an open file, a batch of lines at a time
+    Parameters: f - file opened for writing
+    '''
+    def write_lines(self, f):
+        lines = self.iter_lines()
+        batch = list(islice(lines, LINE_BATCH_SIZE))
+        while batch:
+            batch.append("")
+            f.write("\n".join(batch))
+            batch = list(islice(lines, LINE_BATCH_SIZE))
+    '''
+    Method which returns the state of the current table for pickling (e.g results sent back by worker processes)
+    The rows are left out when the columns exist, since they can be rebuilt from them, and views are gathered
+    Return: dictionary of instance variables
+    '''
+    def __getstate__(self):
+        if self._view is not None:
+            self.columns
+        state = self.__dict__.copy()
+        if state["_columns"] is not None:
+            state["_data"] = None
+        return state
+    '''
+    Method which restores the state of a pickled table
+    The table gets a new version, since versions are only unique inside the process that created them
+    Parameters: state - dictionary of instance variables
+    '''
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.version = next(table_versions)
+    '''
+    Method which returns the number of rows of the current table
+    Return: row count
+    '''
+    def __len__(self):
+        if self._columns is not None:
+            return len(self._columns[0]) if self._columns else 0
+        if self._view is not None:
+            return len(self._view[1])
+        return len(self._data)
+    '''
+    Row-oriented view of the current table (list of records), built from the columns on first access
+    '''
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = [list(record) for record in zip(*self.columns)]
+        return self._data
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._columns = None
+        self._view = None
+        self.statistics = {}
+        self.version = next(table_versions)
+    '''
+    Column-oriented view of the current table (one column per attribute), built from the records on first access
+    '''
+    @property
+    def columns(self):
+        if self._columns is None:
+            if self._view is not None:
+                # Deal with a view: its rows are gathered from the base table once, on first access
+                base_table, row_ids, attr_indices = self.view_parts()
+                gather = vectorized.take_column if vectorized.enabled() else take_column
+                self._columns = [gather(base_table.columns[i], row_ids) for i in attr_indices]
+                self._view = None
+            elif self._data:
+                self._columns = [make_column(list(values)) for values in zip(*self._data)]
+            else:
+                self._columns = [[] for _ in self.header]
+        return self._columns
+    @columns.setter
+    def columns(self, columns):
+        self._columns = columns
+        self._data = None
+        self._view = None
+        self.statistics = {}
+        self.version = next(table_versions)
     '''
     Method which finds the index by attribute name
     Parameters: attr - attribute name
@@ -45,84 +271,170 @@ class Table:
                 return index
     '''
     Method which performs select operation on the current table based on a single condition
-    Parameters: condition - function that determines whether one row of data should be added to the result table
+    Parameters: condition - compiled filter that returns the row positions satisfying the condition
                 index_attr - attribute with index
-                index_key - index key value
+                index_key - index key value (KeyRange for B-tree range scans)
     Return: a result table satisfying select condition
     '''
     def select(self, condition, index_attr, index_key):
-        result_table = Table()
-        result_table.header = self.header
-        data = []
+        return self.take(self.select_rows(condition, index_attr, index_key))
+    '''
+    Method which finds the rows of the current table satisfying a single condition
+    Parameters: condition - compiled filter that returns the row positions satisfying the condition
+                index_attr - attribute with index
+                index_key - index key value (KeyRange for B-tree range scans)
+                row_ids - row positions the search is restricted to, None for the whole table
+    Return: row positions satisfying select condition in ascending order
+    '''
+    def select_rows(self, condition, index_attr, index_key, row_ids=None):
         if index_attr is not None:
-            if index_attr in self.attr_with_hash_index:
-                indices = self.hash_structure[index_key]
-            else:
-                indices = self.btree[index_key]
-            for i in indices:
-                data.append(self.data[i])
-        else:
-            for record in self.data:
-                if condition(self, record):
-                    data.append(record)
-        result_table.data = data
-        return result_table
+            # The condition is checked again on the rows found with the index
+            return condition(self, self.lookup_index(index_attr, index_key))
+        return condition(self, row_ids)
     '''
     Method which performs select operation on the current table based on multiple conditions separated by "or"
-    Parameters: conditions - function that determines whether one row of data should be added to the result table
-                index_attr - attribute with index
-                index_key - index key value
+    Parameters: conditions - compiled filters that return the row positions satisfying each condition
+                index_attrs - attribute with index of every condition, None to scan the table
+                index_keys - index key value (or KeyRange) of every condition
     Return: a result table satisfying select conditions
     '''
-    def select_or(self, conditions, index_attr, index_key):
-        result_table = Table()
-        result_table.header = self.header
-        data = []
-        for record in self.data:
-            flag = False
-            for cond in conditions:
-                flag = flag or cond(self, record)
-            if flag:
-                data.append(record)
-        result_table.data = data
-        return result_table
-
+    def select_or(self, conditions, index_attrs, index_keys):
+        return self.take(self.select_or_rows(conditions, index_attrs, index_keys))
+    '''
+    Method which finds the rows of the current table satisfying multiple conditions separated by "or"
+    The rows of every condition are found with its index (or a scan) and merged, keeping the order of the table
+    Parameters: conditions - compiled filters that return the row positions satisfying each condition
+                index_attrs - attribute with index of every condition, None to scan the table
+                index_keys - index key value (or KeyRange) of every condition
+                row_ids - row positions the search is restricted to, None for the whole table
+    Return: row positions satisfying select conditions in ascending order
+    '''
+    def select_or_rows(self, conditions, index_attrs, index_keys, row_ids=None):
+        if index_attrs is not None:
+            cond_row_ids = [cond(self, self.lookup_index(index_attr, index_key)) for cond, index_attr, index_key in zip(conditions, index_attrs, index_keys)]
+        else:
+            cond_row_ids = [cond(self, row_ids) for cond in conditions]
+        if vectorized.enabled():
+            return vectorized.union_row_ids(cond_row_ids, row_ids)
+        matched = set()
+        for ids in cond_row_ids:
+            matched.update(ids)
+        if row_ids is not None:
+            # The rows keep the order they are given in (e.g rows of a sorted view)
+            return [i for i in row_ids if i in matched]
+        return sorted(matched)
     '''
     Method which performs select operation on the current table based on multiple conditions separated by "and"
-    Parameters: conditions - function that determines whether one row of data should be added to the result table
+    Parameters: conditions - compiled filters that return the row positions satisfying each condition
                 index_attr - attribute with index
-                index_key - index key value
+                index_key - index key value (KeyRange for B-tree range scans)
     Return: a result table satisfying select conditions
     '''
     def select_and(self, conditions, index_attr, index_key):
-        result_table = Table()
-        result_table.header = self.header
-        data = []
+        return self.take(self.select_and_rows(conditions, index_attr, index_key))
+    '''
+    Method which finds the rows of the current table satisfying multiple conditions separated by "and"
+    Parameters: conditions - compiled filters that return the row positions satisfying each condition
+                index_attr - attribute with index
+                index_key - index key value (KeyRange for B-tree range scans)
+                row_ids - row positions the search is restricted to, None for the whole table
+    Return: row positions satisfying select conditions in ascending order
+    '''
+    def select_and_rows(self, conditions, index_attr, index_key, row_ids=None):
         if index_attr is not None:
-            if index_attr in self.attr_with_hash_index:
-                indices = self.hash_structure[index_key]
+            row_ids = self.lookup_index(index_attr, index_key)
+        # Every condition only checks the rows that satisfied the previous ones
+        for cond in conditions:
+            row_ids = cond(self, row_ids)
+        return row_ids
+    '''
+    Method which finds the rows of the current table with the given key using the index on an attribute
+    Parameters: index_attr - attribute with index
+                index_key - index key value, or KeyRange of values scanned with the B-tree index
+    Return: list of row positions in ascending order (empty if the key is not indexed)
+    '''
+    def lookup_index(self, index_attr, index_key):
+        if isinstance(index_key, KeyRange):
+            btree = self.get_index(index_attr, "btree")
+            row_ids = [i for indices in btree.values(index_key.low, index_key.high, index_key.exclude_low, index_key.exclude_high) for i in indices]
+            row_ids.sort()
+            return row_ids
+        return self.get_index(index_attr).get(index_key, [])
+    '''
+    Method which finds an index on an attribute of the current table in the index catalog
+    Parameters: attr - attribute name
+                kind - kind of the index ("hash" or "btree"), None for the best index for equality lookups
+    Return: the index, None if there is no such index
+    '''
+    def get_index(self, attr, kind=None):
+        if kind is not None:
+            return self.indexes.get((attr, kind))
+        # Hash lookups are cheaper than B-tree lookups
+        for kind in ("hash", "btree"):
+            if (attr, kind) in self.indexes:
+                return self.indexes[(attr, kind)]
+        return None
+    '''
+    Method which computes the exact statistics of every attribute of the current table (analyze operation)
+    Return: dictionary attribute -> ColumnStatistics (attributes of an empty table are left out)
+    '''
+    def analyze(self):
+        self.statistics = {}
+        for attr, column in zip(self.header, self.columns):
+            column_statistics = optimizer.compute_column_statistics(column, True)
+            if column_statistics is not None:
+                self.statistics[attr] = column_statistics
+        return self.statistics
+    '''
+    Method which finds the statistics of an attribute of the current table, computing them from a sample of the rows
+    if the table was not analyzed
+    Parameters: attr - attribute name
+    Return: ColumnStatistics of the attribute, None if the table is empty or has no such attribute
+    '''
+    def get_statistics(self, attr):
+        column_statistics = self.statistics.get(attr)
+        if column_statistics is None and attr in self.header:
+            column_statistics = optimizer.compute_column_statistics(self.columns[self.get_attr_index(attr)], False)
+            if column_statistics is not None and column_statistics.sampled and self.get_index(attr, "hash") is not None:
+                # The hash index knows the exact number of distinct values
+                column_statistics = column_statistics._replace(num_distinct=len(self.get_index(attr, "hash")))
+            if column_statistics is not None:
+                self.statistics[attr] = column_statistics
+        return column_statistics
+    '''
+    Method which builds a table from the given rows of the current table
+    The result is a view on the base table of the current table: only the row positions are stored, and the values are
+    gathered when the columns of the result are needed
+    Parameters: row_ids - row positions that will be kept
+    Return: a result table containing the given rows
+    '''
+    def take(self, row_ids):
+        base_table, base_row_ids, attr_indices = self.view_parts()
+        if base_row_ids is not None:
+            # Deal with a view: the positions are translated to positions of the base table
+            if vectorized.is_numpy_array(base_row_ids) or vectorized.is_numpy_array(row_ids):
+                row_ids = vectorized.np.asarray(base_row_ids)[vectorized.np.asarray(row_ids, dtype=vectorized.np.intp)]
             else:
-                indices = self.btree[index_key]
-            for i in indices:
-                record = self.data[i]
-                flag = True
-                for cond in conditions:
-                    flag = flag and cond(self, record)
-                if flag:
-                    data.append(record)
-        else:
-            for record in self.data:
-                flag = True
-                for cond in conditions:
-                    flag = flag and cond(self, record)
-                if flag:
-                    data.append(record)
-        result_table.data = data
-        return result_table
+                row_ids = [base_row_ids[i] for i in row_ids]
+        return make_view(base_table, row_ids, attr_indices)
+    '''
+    Method which finds the table holding the values of the current table and the rows and attributes it selects
+    Return: base table, row positions (None for every row in the order of the base table) and attribute positions
+    '''
+    def view_parts(self):
+        if self._view is not None:
+            base_table, row_ids, attr_indices = self._view
+            if isinstance(row_ids, sorting.MergedRows):
+                # Deal with the rows of an external sort: they are merged once, when an operation needs their positions
+                self._view = (base_table, row_ids.materialize(), attr_indices)
+            return self._view
+        return self, None, list(range(len(self.header)))
     '''
     Method which performs join operation on the current table based on a single condition
+    The matching rows are found from the columns (records are only built for the rows a condition is checked on), and
+    the result rows are gathered from the matching pairs of rows
     Parameters: table2 - the second table that needs to be joined to the first table
-                condition - function that determines whether one row of data should be added to the result table
+                condition - compiled function (record1, record2) that determines whether a pair of records should be added to the result table
                 table1_name - name of the first table
                 table2_name - name of the second table
                 ref_attr - attribute whose value can be the index key value
@@ -130,55 +442,26 @@ class Table:
     Return: a result table satisfying join conditions
     '''
     def join(self, table2, condition, table1_name, table2_name, index_attr, ref_attr, rev_flag):
-        result_table = Table()
-        header = []
-        if rev_flag:
-            for attr_name in table2.header:
-                header.append("{0}_{1}".format(table1_name, attr_name))
-            for attr_name in self.header:
-                header.append("{0}_{1}".format(table2_name, attr_name))
-        else:
-            for attr_name in self.header:
-                header.append("{0}_{1}".format(table1_name, attr_name))
-            for attr_name in table2.header:
-                header.append("{0}_{1}".format(table2_name, attr_name))
-        result_table.header = header
-        data = []
+        pairs = []
         if ref_attr is not None:
-            ref_attr_index = table2.get_attr_index(ref_attr)
-            for record2 in table2.data:
-                indices = []
-                if index_attr in self.attr_with_hash_index:
-                    if record2[ref_attr_index] in self.hash_structure:
-                        indices = self.hash_structure[record2[ref_attr_index]]
-                else:
-                    if record2[ref_attr_index] in self.btree:
-                        indices = self.btree[record2[ref_attr_index]]
-                if indices:
-                    for i in indices:
-                        record1 = self.data[i]
-                        new_record = []
-                        if rev_flag:
-                            new_record.extend(record2)
-                            new_record.extend(record1)
-                        else:
-                            new_record.extend(record1)
-                            new_record.extend(record2)
-                        data.append(new_record)
+            index = self.get_index(index_attr)
+            for j, key in enumerate(table2.columns[table2.get_attr_index(ref_attr)]):
+                if key in index:
+                    pairs.extend([(i, j) for i in index[key]])
         else:
-            for record1 in self.data:
-                for record2 in table2.data:
-                    if condition(self, record1, table2, record2):
-                        new_record = []
-                        new_record.extend(record1)
-                        new_record.extend(record2)
-                        data.append(new_record)
-        result_table.data = data
-        return result_table
+            # The records of the second table are checked against every record of the first table, they are built once
+            records2 = list(zip(*table2.columns))
+            for i, record1 in enumerate(zip(*self.columns)):
+                pairs.extend([(i, j) for j, record2 in enumerate(records2) if condition(record1, record2)])
+        if rev_flag:
+            return table2.join_pairs(self, table1_name, table2_name, [(j, i) for i, j in pairs])
+        return self.join_pairs(table2, table1_name, table2_name, pairs)
     '''
     Method which performs join operation on the current table based on a single condition
+    The matching rows are found from the columns (records are only built for the rows the conditions are checked on),
+    and the result rows are gathered from the matching pairs of rows
     Parameters: table2 - the second table that needs to be joined to the first table
-                condition - function that determines whether one row of data should be added to the result table
+                condition - compiled function (record1, record2) that determines whether a pair of records should be added to the result table
                 table1_name - name of the first table
                 table2_name - name of the second table
                 ref_attr - attribute whose value can be the index key value
@@ -186,60 +469,156 @@ class Table:
     Return: a result table satisfying join conditions
     '''
     def join_and(self, table2, conditions, table1_name, table2_name, index_attr, ref_attr, rev_flag):
-        result_table = Table()
-        header = []
-        if rev_flag:
-            for attr_name in table2.header:
-                header.append("{0}_{1}".format(table1_name, attr_name))
-            for attr_name in self.header:
-                header.append("{0}_{1}".format(table2_name, attr_name))
-        else:
-            for attr_name in self.header:
-                header.append("{0}_{1}".format(table1_name, attr_name))
-            for attr_name in table2.header:
-                header.append("{0}_{1}".format(table2_name, attr_name))
-        result_table.header = header
-        data = []
+        pairs = []
         if ref_attr is not None:
-            ref_attr_index = table2.get_attr_index(ref_attr)
-            for record2 in table2.data:
-                indices = []
-                if index_attr in self.attr_with_hash_index:
-                    if record2[ref_attr_index] in self.hash_structure:
-                        indices = self.hash_structure[record2[ref_attr_index]]
-                else:
-                    if record2[ref_attr_index] in self.btree:
-                        indices = self.btree[record2[ref_attr_index]]
-                if indices:
-                    for i in indices:
-                        record1 = self.data[i]
-                        flag = True
-                        for cond in conditions:
-                            if rev_flag:
-                                flag = flag and cond(table2, record2, self, record1)
-                            else:
-                                flag = flag and cond(self, record1, table2, record2)
+            index = self.get_index(index_attr)
+            columns1 = self.columns
+            columns2 = table2.columns
+            for j, key in enumerate(columns2[table2.get_attr_index(ref_attr)]):
+                if key in index:
+                    record2 = tuple(column[j] for column in columns2)
+                    for i in index[key]:
+                        record1 = tuple(column[i] for column in columns1)
+                        if rev_flag:
+                            flag = all(cond(record2, record1) for cond in conditions)
+                        else:
+                            flag = all(cond(record1, record2) for cond in conditions)
                         if flag:
-                            new_record = []
-                            if rev_flag:
-                                new_record.extend(record2)
-                                new_record.extend(record1)
-                            else:
-                                new_record.extend(record1)
-                                new_record.extend(record2)
-                            data.append(new_record)
+                            pairs.append((i, j))
         else:
-            for record1 in self.data:
-                for record2 in table2.data:
-                    flag = True
-                    for cond in conditions:
-                        flag = flag and cond(self, record1, table2, record2)
-                    if flag:
-                        new_record = []
-                        new_record.extend(record1)
-                        new_record.extend(record2)
-                        data.append(new_record)
-        result_table.data = data
+            # The records of the second table are checked against every record of the first table, they are built once
+            records2 = list(zip(*table2.columns))
+            for i, record1 in enumerate(zip(*self.columns)):
+                for j, record2 in enumerate(records2):
+                    if all(cond(record1, record2) for cond in conditions):
+                        pairs.append((i, j))
+        if rev_flag:
+            return table2.join_pairs(self, table1_name, table2_name, [(j, i) for i, j in pairs])
+        return self.join_pairs(table2, table1_name, table2_name, pairs)
+    '''
+    Method which performs join operation on the current table with a hash table built on the fly, used for equality
+    conditions when no index is available (or probing it row by row would cost more)
+    The result rows are in the same order as with the nested loop join (by row of the first table, then by row of the
+    second table), or ordered by row of the second table first. With a join memory budget, a hash table that would not
+    fit into it is replaced by a Grace hash join of partitions spilled to disk (see joining.py)
+    Parameters: table2 - the second table that needs to be joined to the first table
+                key1 - function returning the join key of every row of the first table
+                key2 - function returning the join key of every row of the second table
+                conditions - compiled pair filters of the remaining conditions
+                table1_name - name of the first table
+                table2_name - name of the second table
+                build_on_first - True to build the hash table on the current table and probe it with the second table,
+                                 False for the opposite
+                order_by_second - True to order the result rows by row of the second table first
+    Return: a result table satisfying join conditions
+    '''
+    def hash_join(self, table2, key1, key2, conditions, table1_name, table2_name, build_on_first, order_by_second=False):
+        if build_on_first:
+            build_keys, probe_keys = key1(self), key2(table2)
+        else:
+            build_keys, probe_keys = key2(table2), key1(self)
+        if joining.enabled():
+            def pair_filter(pairs):
+                for cond in conditions:
+                    pairs = cond(self, table2, pairs)
+                return pairs
+            pair_batches = joining.hash_join_pairs(build_keys, probe_keys, build_on_first, order_by_second, pair_filter)
+            if pair_batches is not None:
+                return self.join_pair_batches(table2, table1_name, table2_name, pair_batches)
+        hash_table = {}
+        for index, key in enumerate(build_keys):
+            if key in hash_table:
+                hash_table[key].append(index)
+            else:
+                hash_table[key] = [index]
+        pairs = []
+        for probe_index, key in enumerate(probe_keys):
+            if key in hash_table:
+                if build_on_first:
+                    pairs.extend([(index, probe_index) for index in hash_table[key]])
+                else:
+                    pairs.extend([(probe_index, index) for index in hash_table[key]])
+        # Pairs are generated in the order of the probing rows, the other order is restored with a stable sort
+        if build_on_first and not order_by_second:
+            pairs.sort(key=itemgetter(0))
+        elif order_by_second and not build_on_first:
+            pairs.sort(key=itemgetter(1))
+        for cond in conditions:
+            pairs = cond(self, table2, pairs)
+        return self.join_pairs(table2, table1_name, table2_name, pairs)
+    '''
+    Method which performs join operation on the current table based on an inequality condition
+    The rows of the second table are sorted by their join key, so the rows matching a row of the first table form a
+    contiguous range found with a binary search; the result rows are in the same order as with the nested loop join
+    Parameters: table2 - the second table that needs to be joined to the first table
+                key1 - function returning the join key of every row of the first table
+                key2 - function returning the join key of every row of the second table
+                operator - relop of the condition (<, <=, >, >=) comparing key1 to key2
+                conditions - compiled pair filters of the remaining conditions
+                table1_name - name of the first table
+                table2_name - name of the second table
+    Return: a result table satisfying join conditions
+    '''
+    def band_join(self, table2, key1, key2, operator, conditions, table1_name, table2_name):
+        keys2 = key2(table2)
+        order = sorted(range(len(keys2)), key=keys2.__getitem__)
+        sorted_keys = [keys2[j] for j in order]
+        pairs = []
+        for i, key in enumerate(key1(self)):
+            # Find the range of sorted rows of the second table satisfying: key operator key2
+            if operator == "<":
+                matches = order[bisect_right(sorted_keys, key):]
+            elif operator == "<=":
+                matches = order[bisect_left(sorted_keys, key):]
+            elif operator == ">":
+                matches = order[:bisect_left(sorted_keys, key)]
+            else:
+                matches = order[:bisect_right(sorted_keys, key)]
+            matches.sort()
+            pairs.extend([(i, j) for j in matches])
+        for cond in conditions:
+            pairs = cond(self, table2, pairs)
+        return self.join_pairs(table2, table1_name, table2_name, pairs)
+    '''
+    Method which builds the result table of a join from the matching pairs of rows
+    Parameters: table2 - the second table joined to the current table
+                table1_name - name of the first table
+                table2_name - name of the second table
+                pairs - (row of the current table, row of the second table) pairs
+    Return: a result table containing the concatenated rows of every pair
+    '''
+    def join_pairs(self, table2, table1_name, table2_name, pairs):
+        result_table = Table()
+        header = []
+        for attr_name in self.header:
+            header.append("{0}_{1}".format(table1_name, attr_name))
+        for attr_name in table2.header:
+            header.append("{0}_{1}".format(table2_name, attr_name))
+        result_table.header = header
+        rows1 = [pair[0] for pair in pairs]
+        rows2 = [pair[1] for pair in pairs]
+        result_table.columns = self.take(rows1).columns + table2.take(rows2).columns
+        return result_table
+    '''
+    Method which builds the result table of a join from batches of matching pairs of rows, gathering the rows of every
+    batch into the result columns before the next batch is generated
+    Parameters: table2 - the second table joined to the current table
+                table1_name - name of the first table
+                table2_name - name of the second table
+                pair_batches - iterator over lists of (row of the current table, row of the second table) pairs
+    Return: a result table containing the concatenated rows of every pair
+    '''
+    def join_pair_batches(self, table2, table1_name, table2_name, pair_batches):
+        result_table = None
+        for pairs in pair_batches:
+            batch_table = self.join_pairs(table2, table1_name, table2_name, pairs)
+            if result_table is None:
+                result_table = batch_table
+            else:
+                for column, values in zip(result_table.columns, batch_table.columns):
+                    extend_column(column, values)
+        if result_table is None:
+            return self.join_pairs(table2, table1_name, table2_name, [])
         return result_table
     '''
     Method which performs project operation on the current table
@@ -254,14 +633,13 @@ class Table:
             if attr_name in attrs:
                 header.append(attr_name)
                 attr_indices.append(i)
+        if self._view is not None:
+            # Deal with a view: the result selects the same rows of the base table
+            base_table, row_ids, base_attr_indices = self._view
+            return make_view(base_table, row_ids, [base_attr_indices[i] for i in attr_indices])
         result_table.header = header
-        data = []
-        for record in self.data:
-            new_record = []
-            for i in attr_indices:
-                new_record.append(record[i])
-            data.append(new_record)
-        result_table.data = data
+        # Columns are never modified in place, so the result shares them with the current table
+        result_table.columns = [self.columns[i] for i in attr_indices]
         return result_table
     '''
     Method which performs sum/avg operation on the current table based on a single attribute
@@ -277,15 +655,20 @@ class Table:
         else:
             header.append("sum{0}".format(attr))
         result_table.header = header
-        col_data = []
         attr_index = self.get_attr_index(attr)
-        for record in self.data:
-            col_data.append(record[attr_index])
+        col_data = self.columns[attr_index]
+        col_sum = None
+        if vectorized.enabled():
+            col_sum = vectorized.column_sum(col_data)
+        if col_sum is None and partitioned.enabled(len(col_data)):
+            col_sum = partitioned.column_sum(col_data)
+        if col_sum is None:
+            col_sum = sum(col_data)
         data = []
         if avg:
-            data.append([sum(col_data)/len(col_data)])
+            data.append([col_sum/len(col_data)])
         else:
-            data.append([sum(col_data)])
+            data.append([col_sum])
         result_table.data = data
         return result_table
     '''
@@ -311,29 +694,48 @@ class Table:
         result_table.header = header
         ga_sa_map = {}
         ga_sa_count = {}
-        for record in self.data:
-            ga_key = []
-            for i in group_attrs_indices:
-                ga_key.append(record[i])
-            ga_key = tuple(ga_key)
-            if ga_key in ga_sa_map:
-                ga_sa_map[ga_key] += record[sum_attr_index]
-                ga_sa_count[ga_key] += 1
-            else:
-                ga_sa_map[ga_key] = record[sum_attr_index]
-                ga_sa_count[ga_key] = 1
+        aggregates = None
+        # Encoded group attributes are grouped by their codes, decoded once per group
+        key_columns = [encoding.key_column(self.columns[i]) for i in group_attrs_indices]
+        if vectorized.enabled():
+            aggregates = vectorized.group_aggregate(self.columns[sum_attr_index], key_columns)
+        if aggregates is None and partitioned.enabled(len(self)):
+            aggregates = partitioned.group_aggregate(self.columns[sum_attr_index], key_columns)
+        if aggregates is not None:
+            keys, sums, counts = aggregates
+            ga_sa_map = dict(zip(keys, sums))
+            ga_sa_count = dict(zip(keys, counts))
+        else:
+            for ga_key, sa_value in zip(self.group_keys(group_attrs_indices), self.columns[sum_attr_index]):
+                if ga_key in ga_sa_map:
+                    ga_sa_map[ga_key] += sa_value
+                    ga_sa_count[ga_key] += 1
+                else:
+                    ga_sa_map[ga_key] = sa_value
+                    ga_sa_count[ga_key] = 1
         data = []
-        for ga_key, sa_sum in ga_sa_map.items():
+        group_columns = [self.columns[i] for i in group_attrs_indices]
+        for ga_key, ga_values in zip(ga_sa_map, encoding.decode_keys(list(ga_sa_map), group_columns)):
+            sa_sum = ga_sa_map[ga_key]
             new_record = []
             if avg:
                 new_record.append(sa_sum/ga_sa_count[ga_key])
             else:
                 new_record.append(sa_sum)
-            new_record.extend(list(ga_key))
+            new_record.extend(list(ga_values))
             data.append(new_record)
         result_table.data = data
         return result_table
     '''
+    Method which generates the group key of every row of the current table
+    Parameters: group_attrs_indices - indices of the group attributes
+    Return: iterator over tuples of group attribute values (codes of encoded attributes), one per row
+    '''
+    def group_keys(self, group_attrs_indices):
+        if not group_attrs_indices:
+            return repeat((), len(self))
+        return zip(*[encoding.key_column(self.columns[i]) for i in group_attrs_indices])
+    '''
     Method which performs count operation on the current table
     Parameters: table_name - name of the current table
     Return: a result table containing the counted number of rows of the current table
@@ -343,7 +745,7 @@ class Table:
         header = ["count{0}".format(table_name)]
         result_table.header = header
         data = []
-        data.append([len(self.data)])
+        data.append([len(self)])
         result_table.data = data
         return result_table
     '''
@@ -362,87 +764,176 @@ class Table:
                 header.append(attr_name)
                 group_attrs_indices.append(self.get_attr_index(attr_name))
         result_table.header = header
-        ga_ca_count = {}
-        for record in self.data:
-            ga_key = []
-            for i in group_attrs_indices:
-                ga_key.append(record[i])
-            ga_key = tuple(ga_key)
-            if ga_key in ga_ca_count:
-                ga_ca_count[ga_key] += 1
-            else:
-                ga_ca_count[ga_key] = 1
+        aggregates = None
+        key_columns = [encoding.key_column(self.columns[i]) for i in group_attrs_indices]
+        if vectorized.enabled():
+            aggregates = vectorized.group_aggregate(None, key_columns)
+        if aggregates is None and partitioned.enabled(len(self)):
+            aggregates = partitioned.group_aggregate(None, key_columns)
+        if aggregates is not None:
+            ga_ca_count = dict(zip(aggregates[0], aggregates[2]))
+        else:
+            ga_ca_count = Counter(self.group_keys(group_attrs_indices))
         data = []
-        for ga_key, ca_num in ga_ca_count.items():
+        group_columns = [self.columns[i] for i in group_attrs_indices]
+        for ga_values, ca_num in zip(encoding.decode_keys(list(ga_ca_count), group_columns), ga_ca_count.values()):
             new_record = []
             new_record.append(ca_num)
-            new_record.extend(list(ga_key))
+            new_record.extend(list(ga_values))
             data.append(new_record)
         result_table.data = data
         return result_table
     '''
+    Method which builds a table containing the columns of the current table and a new column
+    Parameters: attr_name - name of the new attribute
+                values - values of the new attribute, one per row
+    Return: a result table with the new attribute appended (the existing columns are shared)
+    '''
+    def append_column(self, attr_name, values):
+        result_table = Table()
+        result_table.header = self.header + [attr_name]
+        if isinstance(values, array):
+            column = values
+        else:
+            column = make_column(values)
+        result_table.columns = self.columns + [column]
+        return result_table
+    '''
     Method which performs movsum/movavg operation on the current table
+    The window sum is kept up to date while moving over the rows, so the cost does not depend on the window size
     Parameters: movsum_attr - attribute that needs to be calculated moving sums/averages
                 movsum_range - size of the moving window
                 avg - operation indicator: movsum/movavg
     Return: a result table containing the calculated moving sums/averages of the given attribute
     '''
     def movsum(self, movsum_attr, movsum_range, avg=False):
-        result_table = Table()
-        header = []
-        header.extend(self.header)
         if avg:
-            header.append("movavg{0}".format(movsum_attr))
+            attr_name = "movavg{0}".format(movsum_attr)
         else:
-            header.append("movsum{0}".format(movsum_attr))
-        result_table.header = header
-        new_attr_index = len(result_table.header) - 1
-        movsum_attr_index = self.get_attr_index(movsum_attr)
-        data = []
-        for i,record in enumerate(self.data):
-            new_record = []
-            new_record.extend(record)
-            new_record.append(0)
-            mov_count = 0
-            for j in range(movsum_range):
-                if i - j >= 0:
-                    mov_count += 1
-                    new_record[new_attr_index] += self.data[i-j][movsum_attr_index]
+            attr_name = "movsum{0}".format(movsum_attr)
+        column = self.columns[self.get_attr_index(movsum_attr)]
+        movsum_range = max(movsum_range, 0)
+        if vectorized.enabled():
+            new_column = vectorized.moving_sum(column, movsum_range, avg)
+            if new_column is not None:
+                return self.append_column(attr_name, new_column)
+        values = []
+        mov_sum = 0
+        for i, value in enumerate(column):
+            mov_sum += value
+            if i >= movsum_range:
+                mov_sum -= column[i - movsum_range]
             if avg:
-                new_record[new_attr_index] = new_record[new_attr_index] / mov_count
-            data.append(new_record)
-        result_table.data = data
-        return result_table
+                values.append(mov_sum / min(i + 1, movsum_range))
+            elif movsum_range:
+                values.append(mov_sum)
+            else:
+                values.append(0)
+        return self.append_column(attr_name, values)
+    '''
+    Method which performs movmin/movmax operation on the current table
+    A deque keeps the rows of the window that can still become the minimum/maximum, so every row is added and
+    removed once
+    Parameters: movmin_attr - attribute that needs to be calculated moving minimums/maximums
+                movmin_range - size of the moving window
+                use_max - operation indicator: movmin/movmax
+    Return: a result table containing the calculated moving minimums/maximums of the given attribute
+    '''
+    def movmin(self, movmin_attr, movmin_range, use_max=False):
+        if use_max:
+            attr_name = "movmax{0}".format(movmin_attr)
+        else:
+            attr_name = "movmin{0}".format(movmin_attr)
+        if movmin_range < 1:
+            raise ValueError("Window size of {0} must be positive".format(attr_name))
+        column = self.columns[self.get_attr_index(movmin_attr)]
+        values = []
+        window = deque()
+        for i, value in enumerate(column):
+            # Drop the rows that can no longer be the minimum/maximum of a window
+            if use_max:
+                while window and column[window[-1]] <= value:
+                    window.pop()
+            else:
+                while window and column[window[-1]] >= value:
+                    window.pop()
+            window.append(i)
+            if window[0] <= i - movmin_range:
+                window.popleft()
+            values.append(column[window[0]])
+        return self.append_column(attr_name, values)
+    '''
+    Method which performs movcount operation on the current table
+    Parameters: movcount_attr - attribute of the moving window
+                movcount_range - size of the moving window
+    Return: a result table containing the number of rows inside the moving window of every row
+    '''
+    def movcount(self, movcount_attr, movcount_range):
+        movcount_range = max(movcount_range, 0)
+        values = array("q", [min(i + 1, movcount_range) for i in range(len(self))])
+        return self.append_column("movcount{0}".format(movcount_attr), values)
+    '''
+    Method which performs cumsum operation on the current table
+    Parameters: cumsum_attr - attribute that needs to be calculated cumulative sums
+    Return: a result table containing the sum of the given attribute over every row up to the current one
+    '''
+    def cumsum(self, cumsum_attr):
+        column = self.columns[self.get_attr_index(cumsum_attr)]
+        return self.append_column("cumsum{0}".format(cumsum_attr), list(accumulate(column)))
     '''
     Method which performs sort operation on the current table
+    With a limit, only the first rows are kept while scanning the rows (a heap of at most limit rows), in O(n log limit).
+    Without a limit, sorts whose keys exceed config.SORT_MEMORY_BUDGET are external merge sorts (see sorting.py)
     Parameters: sort_attrs - attributes that need to be sorted
+                descending - flag of every attribute, True to sort it in descending order (None for all ascending)
+                limit - maximum number of result rows, None to keep every row
     Return: a result table containing the sorted data of the current table by the given attributes
     '''
-    def sort(self, sort_attrs):
-        result_table = Table()
-        result_table.header = self.header
-        data = []
-        for record in self.data:
-            data.append(record)
-        sort_attrs_indices = []
-        for attr in sort_attrs:
-            sort_attrs_indices.append(self.get_attr_index(attr))
-        result_table.data = sorted(data, key=lambda x: tuple(x[i] for i in sort_attrs_indices))
-        return result_table
+    def sort(self, sort_attrs, descending=None, limit=None):
+        base_table, row_ids, attr_indices = self.view_parts()
+        row_ids = row_id_list(row_ids) if row_ids is not None else range(len(base_table))
+        if not sort_attrs:
+            # Deal with no sort attribute: every row has the same (empty) key, so the rows keep their order
+            return make_view(base_table, row_id_list(row_ids[:limit]), attr_indices)
+        key_columns = []
+        wrappers = []
+        for position, attr in enumerate(sort_attrs):
+            # Encoded attributes are sorted by their codes (their dictionaries are sorted)
+            column = encoding.key_column(base_table.columns[attr_indices[self.get_attr_index(attr)]])
+            key_columns.append(column)
+            if descending and descending[position]:
+                wrappers.append(neg if isinstance(column, array) else sorting.DescendingKey)
+            else:
+                wrappers.append(None)
+        if limit is None and sorting.enabled():
+            # Deal with a memory budget: the rows are sorted in runs spilled to disk if their keys do not fit into it
+            merged_row_ids = sorting.external_sort(key_columns, wrappers, row_ids)
+            if merged_row_ids is not None:
+                return make_view(base_table, merged_row_ids, attr_indices)
+        keys = list(sorting.sort_keys(key_columns, wrappers, row_ids))
+        # Only the row positions are sorted (the sort is stable, rows with equal keys keep their order)
+        if limit is not None and limit < len(row_ids):
+            # nsmallest keeps the first rows among equal keys, like the full sort
+            order = nsmallest(limit, range(len(row_ids)), key=keys.__getitem__)
+        else:
+            order = sorted(range(len(row_ids)), key=keys.__getitem__)
+        return make_view(base_table, [row_ids[i] for i in order], attr_indices)
     '''
     Method which performs concat operation on two tables with the same schema
     Parameters: table2 - another table that will be concatenated to the current table
     Return: a result table generated by the concatenation of the given two tables
     '''
     def concat(self, table2):
+        base_table1, row_ids1, attr_indices1 = self.view_parts()
+        base_table2, row_ids2, attr_indices2 = table2.view_parts()
+        if base_table1 is base_table2 and attr_indices1 == attr_indices2:
+            # Both tables select rows of the same table, so the result selects both lists of rows
+            row_ids1 = row_id_list(row_ids1 if row_ids1 is not None else range(len(base_table1)))
+            row_ids2 = row_id_list(row_ids2 if row_ids2 is not None else range(len(base_table2)))
+            return make_view(base_table1, row_ids1 + row_ids2, attr_indices1)
         result_table = Table()
         result_table.header = self.header
-        data = []
-        for record in self.data:
-            data.append(record)
-        for record in table2.data:
-            data.append(record)
-        result_table.data = data
+        result_table.columns = [concat_columns(column1, column2) for column1, column2 in zip(self.columns, table2.columns)]
         return result_table
     '''
     Method that performs outputtofile operation on the current table
@@ -450,36 +941,61 @@ class Table:
     Result: output the current table to the given file
     '''
     def output_to_file(self,file_name):
-        with open("{0}.txt".format(file_name), 'w') as f:
-            f.write(str(self))
+        with open("{0}.txt".format(file_name), 'w', buffering=OUTPUT_BUFFER_SIZE) as f:
+            self.write_lines(f)
+    '''
+    Method which saves the columns, schema and indexes of the current table to a binary snapshot file
+    Parameters: file_name - name of the snapshot file (without the .tbl extension)
+    Result: create a snapshot file that can be loaded with load_snapshot
+    '''
+    def save_snapshot(self, file_name):
+        indexes = {key: list(index.items()) for key, index in self.indexes.items()}
+        snapshot.write_snapshot("{0}.tbl".format(file_name), self.header, self.columns, indexes)
+    '''
+    Method which fills the current table from a binary snapshot file, including its hash and B-tree indexes
+    Parameters: file_name - name of the snapshot file (without the .tbl extension)
+    Result: the header, columns and index catalog of the current table are replaced
+    '''
+    def load_snapshot(self, file_name):
+        header, columns, indexes = snapshot.read_snapshot("{0}.tbl".format(file_name))
+        self.header = header
+        self.columns = [encoding.encode_column(column) for column in columns]
+        self.indexes = {}
+        for (attr, kind), items in indexes.items():
+            if kind == "btree":
+                btree = OOBTree()
+                btree.update(items)
+                self.indexes[(attr, kind)] = btree
+            else:
+                self.indexes[(attr, kind)] = dict(items)
     '''
     Method that performs Hash operation on the current table
     Parameters: attr - attribute that will be indexed
-    Result: create hash index on the given attribute of the current table
+    Result: add a hash index on the given attribute to the index catalog of the current table
     '''
     def create_hash_index(self, attr):
-        self.hash_structure = {}
-        self.attr_with_hash_index = {}
+        hash_structure = {}
         attr_index = self.get_attr_index(attr)
-        self.attr_with_hash_index[attr] = True
-        for index in range(len(self.data)):
-            if self.data[index][attr_index] in self.hash_structure:
-                self.hash_structure[self.data[index][attr_index]].append(index)
+        for index, value in enumerate(self.columns[attr_index]):
+            if value in hash_structure:
+                hash_structure[value].append(index)
             else:
-                self.hash_structure[self.data[index][attr_index]] = [index]
+                hash_structure[value] = [index]
+        self.indexes[(attr, "hash")] = hash_structure
+        self.version = next(table_versions)
     '''
     Method that performs Btree operation on the current table
     Parameters: attr - attribute that will be indexed
-    Result: create BTree index on the given attribute of the current table    
+    Result: add a BTree index on the given attribute to the index catalog of the current table    
     '''
     def create_btree_index(self, attr):
-        self.btree = OOBTree()
-        self.attr_with_btree_index = {}
+        btree = OOBTree()
         attr_index = self.get_attr_index(attr)
-        self.attr_with_btree_index[attr] = True
-        for index in range(len(self.data)):
-            if self.data[index][attr_index] in self.btree:
-                self.btree[self.data[index][attr_index]].append(index)
+        for index, value in enumerate(self.columns[attr_index]):
+            if value in btree:
+                btree[value].append(index)
             else:
-                self.btree[self.data[index][attr_index]] = [index]
+                btree[value] = [index]
+        self.indexes[(attr, "btree")] = btree
+        self.version = next(table_versions)
 
@@ -0,0 +1,60 @@
+import io
+import unittest
+from array import array
+from contextlib import redirect_stdout
+import optimizer
+from process import choose_join_strategy, estimate_index_rows, process_analyze
+from table import KeyRange
+from test_table import make_table
+
+'''
+Method which builds a string column whose digit-only values were loaded as integers (values of different types)
+Parameters: num_rows - number of rows
+Return: list of attribute values
+'''
+def make_mixed_column(num_rows):
+    return ["A{0}".format(i % 37) if i % 3 else i % 50 for i in range(num_rows)]
+
+'''
+Class represents the regression tests of the statistics of columns whose values cannot be ordered
+'''
+class MixedColumnStatisticsTest(unittest.TestCase):
+    '''
+    Method which checks that the statistics of a mixed column only count its distinct values
+    '''
+    def test_mixed_column_statistics(self):
+        for exact in (True, False):
+            column_statistics = optimizer.compute_column_statistics(make_mixed_column(1200), exact)
+            self.assertEqual(column_statistics.num_rows, 1200)
+            self.assertGreater(column_statistics.num_distinct, 1)
+            self.assertIsNone(column_statistics.histogram)
+            self.assertEqual(optimizer.estimate_range_selectivity(column_statistics, None), optimizer.DEFAULT_SELECTIVITY)
+    '''
+    Method which checks that a join on mixed columns is planned
+    '''
+    def test_join_on_mixed_columns(self):
+        table1 = make_table(["id", "code"], [array("q", range(1200)), make_mixed_column(1200)])
+        table2 = make_table(["id", "code"], [array("q", range(1500)), make_mixed_column(1500)])
+        strategy = choose_join_strategy(table1, table2, "M.code = N.code")
+        self.assertEqual(strategy.kind, "hash")
+        self.assertIsNotNone(strategy.estimated_rows)
+    '''
+    Method which checks that the rows of a range lookup on a mixed column are estimated
+    '''
+    def test_range_estimate_on_mixed_column(self):
+        table = make_table(["id", "code"], [array("q", range(1200)), make_mixed_column(1200)])
+        num_rows = estimate_index_rows(table, "code", KeyRange("A3", None, True, False))
+        self.assertEqual(num_rows, 1200 * optimizer.DEFAULT_SELECTIVITY)
+    '''
+    Method which checks that analyze reports a mixed column without ordering statistics
+    '''
+    def test_analyze_mixed_column(self):
+        table = make_table(["id", "code"], [array("q", range(1200)), make_mixed_column(1200)])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            process_analyze("analyze", ["M"], {"M": table})
+        self.assertIn("Attribute: code  Distinct: 87", output.getvalue())
+        self.assertEqual(table.statistics["id"].max, 1199)
+
+if __name__ == "__main__":
+    unittest.main()
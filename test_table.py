@@ -0,0 +1,38 @@
+import unittest
+from array import array
+from table import Table
+
+'''
+Method which builds a table from columns
+Parameters: header - attribute names
+            columns - columns of the table
+Return: a table holding the given columns
+'''
+def make_table(header, columns):
+    table = Table()
+    table.header = header
+    table.columns = columns
+    return table
+
+'''
+Class represents the regression tests of the sort operation
+'''
+class SortTest(unittest.TestCase):
+    '''
+    Method which checks that a sort without attributes keeps every row in order
+    '''
+    def test_sort_without_attributes(self):
+        table = make_table(["saleid", "qty"], [array("q", [3, 1, 2]), array("q", [10, 30, 20])])
+        self.assertEqual(table.sort([]).data, table.data)
+        view = table.sort(["qty"])
+        self.assertEqual(view.sort([]).data, view.data)
+    '''
+    Method which checks that a sort with a limit but without attributes keeps the first rows
+    '''
+    def test_sort_limit_without_attributes(self):
+        table = make_table(["saleid", "qty"], [array("q", [3, 1, 2]), array("q", [10, 30, 20])])
+        self.assertEqual(table.sort([], [], 2).data, table.data[:2])
+        self.assertEqual(table.sort([], [], 5).data, table.data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,42 +1,268 @@
+import atexit
+import queue
 import re
-from table import Table
+import threading
+from array import array
+from itertools import repeat
+from table import Table, KeyRange, make_column
+import config
+import encoding
+import metrics
+import vectorized
 
 '''
 Method which writes the result of an operation to the file "AllOperations.txt"
+The result is queued and written by the log writer thread, the operation does not wait for it
 Parameters: op_name - name of the operation
             result_table_name - name of the result table created by the operation
             result_table - table containing the operation result
 '''
 def output_operation_result(op_name, result_table_name, result_table):
-    with open("AllOperations.txt", "a") as f:
-        f.write("Table Name: {0}    Operation Performed: {1}\n\n".format(result_table_name, op_name))
-        f.write(str(result_table))
-        f.write("\n\n\n")
+    if config.LOG_MODE == "off":
+        return
+    if log_buffer is not None:
+        log_buffer.append(format_operation_result(op_name, result_table_name, result_table))
+        return
+    queue_operation_log((op_name, result_table_name, result_table))
+
+'''
+Method which formats the result of an operation as written to the file "AllOperations.txt"
+Parameters: op_name - name of the operation
+            result_table_name - name of the result table created by the operation
+            result_table - table containing the operation result
+Return: text containing the whole table ("full" log), its first config.LOG_ROWS rows ("head" log) or only its attributes
+        and number of rows ("summary" log)
+'''
+def format_operation_result(op_name, result_table_name, result_table):
+    title = format_operation_title(op_name, result_table_name)
+    if config.LOG_MODE == "summary":
+        return "{0}{1}\n({2} rows)\n\n\n".format(title, "|".join(result_table.header), len(result_table))
+    if config.LOG_MODE == "head" and len(result_table) > config.LOG_ROWS:
+        head_table = result_table.take(range(config.LOG_ROWS))
+        return "{0}{1}... ({2} more rows)\n\n\n".format(title, str(head_table), len(result_table) - config.LOG_ROWS)
+    return "{0}{1}\n\n\n".format(title, str(result_table))
+
+'''
+Method which formats the title of an operation result in the file "AllOperations.txt"
+Parameters: op_name - name of the operation
+            result_table_name - name of the result table created by the operation
+Return: title text
+'''
+def format_operation_title(op_name, result_table_name):
+    return "Table Name: {0}    Operation Performed: {1}\n\n".format(result_table_name, op_name)
+
+'''
+Method which appends formatted operation results to the file "AllOperations.txt" (through the log writer thread)
+Parameters: text - formatted operation results
+'''
+def write_operation_log(text):
+    queue_operation_log(text)
+
+'''
+List collecting the logged operation results instead of writing them (used by the workers of the parallel scheduler,
+whose results are written by the main process in the order of the queries), None to write them directly
+'''
+log_buffer = None
+
+'''
+Maximum number of operation results waiting for the log writer thread, operations wait when it is reached
+'''
+LOG_QUEUE_SIZE = 64
+
+'''
+Time in seconds an entry waits at a time for room in the queue of the log writer thread, before checking that the
+thread is still running
+'''
+LOG_WAIT_TIME = 0.1
+
+'''
+Queue of the log writer thread and the thread itself, both created by the first logged result
+'''
+log_queue = None
+log_thread = None
+
+'''
+Exception that stopped the log writer thread, re-raised by the main thread
+'''
+log_error = None
+
+'''
+Method which queues an entry for the log writer thread, starting the thread on first use
+Parameters: entry - formatted text, or (operation name, result table name, result table) formatted by the thread
+'''
+def queue_operation_log(entry):
+    global log_queue, log_thread
+    check_log_writer()
+    if log_thread is None:
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        log_thread = threading.Thread(target=run_log_writer, args=(log_queue, open("AllOperations.txt", "a")), daemon=True)
+        log_thread.start()
+        atexit.register(close_operation_log)
+    put_log_entry(entry)
+
+'''
+Method which puts an entry in the queue of the log writer thread, waiting for room while the thread is running
+Parameters: entry - entry of the log writer thread (None to stop it)
+'''
+def put_log_entry(entry):
+    while True:
+        try:
+            log_queue.put(entry, timeout=LOG_WAIT_TIME)
+            return
+        except queue.Full:
+            pass
+        # Deal with a full queue: a stopped thread will never take the queued entries
+        check_log_writer()
+
+'''
+Method which re-raises the exception that stopped the log writer thread (the entries it did not write are lost); a
+new thread is started by the next logged result
+'''
+def check_log_writer():
+    global log_queue, log_thread, log_error
+    if log_thread is not None and not log_thread.is_alive() and log_error is not None:
+        error = log_error
+        log_queue, log_thread, log_error = None, None, None
+        raise error
+
+'''
+Method run by the log writer thread: writes the queued entries to the file until the queue returns None
+Parameters: entries - queue of entries
+            f - open file "AllOperations.txt", the only handle on it
+'''
+def run_log_writer(entries, f):
+    global log_error
+    try:
+        with f:
+            while True:
+                entry = entries.get()
+                if entry is None:
+                    break
+                if isinstance(entry, str):
+                    f.write(entry)
+                elif config.LOG_MODE == "full":
+                    # Whole tables are streamed to the file instead of being converted to one string
+                    op_name, result_table_name, result_table = entry
+                    f.write(format_operation_title(op_name, result_table_name))
+                    result_table.write_lines(f)
+                    f.write("\n\n\n")
+                else:
+                    f.write(format_operation_result(*entry))
+    except Exception as e:
+        # The thread stops, the exception is re-raised by the main thread at the next logged result (or at close)
+        log_error = e
+
+'''
+Method which waits until every queued result is written and closes the file "AllOperations.txt"
+Result: the exception that stopped the log writer thread is re-raised
+'''
+def close_operation_log():
+    global log_queue, log_thread
+    if log_thread is not None:
+        put_log_entry(None)
+        log_thread.join()
+        check_log_writer()
+        log_queue = None
+        log_thread = None
+
+'''
+Number of characters read from a data file at a time by inputfromfile
+'''
+LOAD_CHUNK_SIZE = 1 << 22
+
+'''
+Number of values of every column used to infer its type
+'''
+TYPE_SAMPLE_SIZE = 1000
+
+'''
+Method which checks whether string is an integer as stored by inputfromfile (only ASCII digits)
+Parameters: s - string
+Return: boolean value
+'''
+def is_int_value(s):
+    return s.isdigit() and s.isascii()
+
+'''
+Method which converts the values of one column of a chunk, keeping integers and strings like the rest of the system
+Parameters: values - list of value strings
+            column_type - inferred type of the column ("int" or "str")
+Return: typed array if the whole chunk matches the inferred integer type, otherwise a list
+'''
+def convert_values(values, column_type):
+    if column_type == "int":
+        joined = "".join(values)
+        # Fast path: every value is a non-empty string of ASCII digits
+        if all(values) and joined.isdigit() and joined.isascii():
+            try:
+                return array("q", map(int, values))
+            except OverflowError:
+                pass
+    elif not any(map(str.isdigit, values)):
+        # Fast path: no value can be an integer
+        return values
+    # Fall back to checking every value
+    return [int(value) if is_int_value(value) else value for value in values]
+
+'''
+Method which splits lines of a data file into the values of every column
+Parameters: lines - lines of the data file
+            num_attrs - number of attributes of the table
+            file_name - name of the data file
+Return: list of value lists, one per attribute (empty if there are no rows)
+'''
+def split_columns(lines, num_attrs, file_name):
+    if not lines:
+        return []
+    # Fast path: every line has the expected number of separators (so no line is blank), the values of all lines can
+    # be split at once and every column is a slice of the values
+    if num_attrs > 1 and set(map(str.count, lines, repeat("|", len(lines)))) == {num_attrs - 1}:
+        values = "|".join(lines).split("|")
+        columns = [values[i::num_attrs] for i in range(num_attrs)]
+        # Whitespace around the lines is not part of the values
+        columns[0] = list(map(str.lstrip, columns[0]))
+        columns[-1] = list(map(str.rstrip, columns[-1]))
+        return columns
+    rows = [line.split("|") for line in map(str.strip, lines) if line]
+    for row in rows:
+        if len(row) != num_attrs:
+            raise ValueError("Row {0} of {1}.txt has {2} values instead of {3}".format("|".join(row), file_name, len(row), num_attrs))
+    return [list(values) for values in zip(*rows)]
 
 '''
 Method which reads data from a data file
+The file is streamed in large chunks and converted column by column; the type of every column is inferred once
+from the first rows, and only chunks with values not matching the inferred type are converted value by value.
+String columns with few distinct values are dictionary encoded once loaded
 Parameters: file_name - name of the data file
 Return: a table filled with data
 '''
 def input_from_file(file_name):
     table = Table()
     with open("{0}.txt".format(file_name), 'r') as f:
-        lines = f.readlines()
         # Store table header
-        table.header = lines[0].strip().split("|")
-        # Store data
-        data = []
-        for line in lines[1:]:
-            values = line.strip().split("|")
-            record = []
-            for value in values:
-                # Check numbers(integers)
-                if bool(re.match(r"^[0-9]+$", value)):
-                    record.append(int(value))
-                else:
-                    record.append(value)
-            data.append(record)
-    table.data = data
+        table.header = f.readline().strip().split("|")
+        columns = [array("q") for _ in table.header]
+        column_types = None
+        rest = ""
+        while True:
+            chunk = f.read(LOAD_CHUNK_SIZE)
+            lines = (rest + chunk).split("\n")
+            # The last line of the chunk may be incomplete
+            rest = lines.pop() if chunk else ""
+            chunk_columns = split_columns(lines, len(table.header), file_name)
+            if chunk_columns and column_types is None:
+                column_types = []
+                for values in chunk_columns:
+                    column_types.append("int" if all(map(is_int_value, values[:TYPE_SAMPLE_SIZE])) else "str")
+            for i, values in enumerate(chunk_columns):
+                values = convert_values(values, column_types[i])
+                if not isinstance(values, array) and isinstance(columns[i], array):
+                    columns[i] = list(columns[i])
+                columns[i].extend(values)
+            if not chunk:
+                break
+    table.columns = [encoding.encode_column(column) if len(column) else [] for column in columns]
     return table
 
 '''
@@ -142,44 +368,51 @@ def parse_complex_expr(s):
     return conditions, logops
 
 '''
-Method which evaluates simplified relop expression
-Parameters: value1 - value of the left side of the expression
-            operator - relop (=, !=, >, >=, <, <=)
-            value2 - value of the right side of the expression
-Return: boolean value
+Python source of the relops (=, !=, >, >=, <, <=) used when compiling conditions
 '''
-def evaluate_relop(value1, operator, value2):
-    if operator == "<":
-        return value1 < value2
-    if operator == "<=":
-        return value1 <= value2
-    if operator == ">":
-        return value1 > value2
-    if operator == ">=":
-        return value1 >= value2
-    if operator == "=":
-        return value1 == value2
-    if operator == "!=":
-        return value1 != value2
+RELOP_SOURCE = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "=": "==", "!=": "!="}
 
 '''
-Method which evaluates simplified arithop expression
-Parameters: value1 - value of the left side of the expression
-            operator - arithop (+, -, *, /)
-            value2 - value of the right side of the expression
-Return: arithmetic value 
+Method which finds the position of an attribute in the schema of a table
+Parameters: table - table whose schema is searched
+            attr - attribute name
+Return: the index of the attribute
 '''
-def evaluate_arithop(value1, operator, value2):
-    value1 = float(value1)
-    value2 = float(value2)
-    if operator == "-":
-        return value1 - value2
-    if operator == "+":
-        return value1 + value2
-    if operator == "*":
-        return value1 * value2
-    if operator == "/":
-        return value1 / value2
+def resolve_attr_index(table, attr):
+    attr_index = table.get_attr_index(attr)
+    if attr_index is None:
+        raise ValueError("Attribute {0} not found".format(attr))
+    return attr_index
+
+'''
+Method which binds a constant of a condition to a name used by the compiled source
+Parameters: s - constant string (number or string literal)
+            constants - dictionary of the names bound so far
+Return: name of the constant
+'''
+def translate_const(s, constants):
+    name = "c{0}".format(len(constants))
+    if is_num(s):
+        constants[name] = get_number(s)
+    else:
+        constants[name] = get_str(s)
+    return name
+
+'''
+Method which translates an arithop expression on an attribute value into Python source
+Parameters: value - source of the attribute value
+            operator - arithop (+, -, *, /)
+            operand - constant string of the right side of the expression
+            column - column of the attribute (numeric columns skip the float conversion)
+            constants - dictionary of the names bound so far
+Return: source of the arithop expression
+'''
+def translate_arithop(value, operator, operand, column, constants):
+    name = "c{0}".format(len(constants))
+    constants[name] = float(operand)
+    if not isinstance(column, array):
+        value = "float({0})".format(value)
+    return "({0} {1} {2})".format(value, operator, name)
 
 '''
 Method which evaluates value of an attribute with index in arithop expression
@@ -201,55 +434,70 @@ def rev_evaluate_arithop(value1, operator, value2):
         return value1 * value2
 
 '''
-Method which evaluates arithop expression inside select operation
-Parameters: expr - arithop expression that needs to be evaluated
-Return: lambda function that evaluates arithop expression
+Method which translates condition (relop expression) inside select operation into Python source
+Parameters: expr - condition expression
+            table - table the condition is evaluated on
+Return: index of the attribute used by the condition, source of the condition on the attribute value "v"
+        and the constants used by the source
 '''
-def evaluate_select_arithop_expr(expr):
-    arithop_expr = parse_arithop_expr(expr)
-    attr = arithop_expr[0]
-    arithop_eval = lambda table, record: evaluate_arithop(record[table.get_attr_index(attr)], arithop_expr[1], arithop_expr[2])
-    return arithop_eval
-
-'''
-Method which evaluates condition (relop expression) inside select operation
-Parameters: expr - condition expression that needs to be evaluated
-Return: lambda function that evaluates condition expression
-'''
-def evaluate_select_relop_expr(expr):
+def translate_select_relop_expr(expr, table):
     relop_expr = parse_relop_expr(expr)
-    operator = relop_expr[1]
-    # evaluate expression like qty / 2 > 30
+    constants = {}
+    # translate expression like qty / 2 > 30
     if is_arithop_expr(relop_expr[0]):
-        arithop_eval = evaluate_select_arithop_expr(relop_expr[0])
-        if is_num(relop_expr[2]):
-            constant = get_number(relop_expr[2])
-        else:
-            constant = get_str(relop_expr[2])
-        relop_eval = lambda table, record: evaluate_relop(arithop_eval(table, record), operator, constant)
-    # evaluate expression like 30 > qty / 2 or 30 > qty
+        arithop_expr = parse_arithop_expr(relop_expr[0])
+        attr_index = resolve_attr_index(table, arithop_expr[0])
+        left = translate_arithop("v", arithop_expr[1], arithop_expr[2], table.columns[attr_index], constants)
+        right = translate_const(relop_expr[2], constants)
+    # translate expression like 30 > qty / 2 or 30 > qty
     elif is_const(relop_expr[0]):
-        if is_num(relop_expr[0]):
-            constant = get_number(relop_expr[0])
-        else:
-            constant = get_str(relop_expr[0])
-        # evaluate expression like 30 > qty / 2
+        left = translate_const(relop_expr[0], constants)
+        # translate expression like 30 > qty / 2
         if is_arithop_expr(relop_expr[2]):
-            arithop_eval = evaluate_select_arithop_expr(relop_expr[2])
-            relop_eval = lambda table, record: evaluate_relop(constant, operator, arithop_eval(table, record))
-        # evaluate expression like 30 > qty
+            arithop_expr = parse_arithop_expr(relop_expr[2])
+            attr_index = resolve_attr_index(table, arithop_expr[0])
+            right = translate_arithop("v", arithop_expr[1], arithop_expr[2], table.columns[attr_index], constants)
+        # translate expression like 30 > qty
         else:
-            attr = relop_expr[2]
-            relop_eval = lambda table, record: evaluate_relop(constant, operator, record[table.get_attr_index(attr)])
-    # evaluate expression like qty > 30
+            attr_index = resolve_attr_index(table, relop_expr[2])
+            right = "v"
+    # translate expression like qty > 30
     else:
-        attr = relop_expr[0]
-        if is_num(relop_expr[2]):
-            constant = get_number(relop_expr[2])
-        else:
-            constant = get_str(relop_expr[2])
-        relop_eval = lambda table, record: evaluate_relop(record[table.get_attr_index(attr)], operator, constant)
-    return relop_eval
+        attr_index = resolve_attr_index(table, relop_expr[0])
+        left = "v"
+        right = translate_const(relop_expr[2], constants)
+    return attr_index, "{0} {1} {2}".format(left, RELOP_SOURCE[relop_expr[1]], right), constants
+
+'''
+Method which compiles condition (relop expression) inside select operation
+The attribute position and the operator are resolved once, so the generated filter only runs a tight
+comprehension over the attribute column (a boolean mask over the NumPy array with the NumPy backend)
+Parameters: expr - condition expression that needs to be compiled
+            table - table the condition is evaluated on (tables with the same schema can reuse the filter)
+Return: function (table, row_ids=None) returning the row positions satisfying the condition,
+        checking all rows or only the given row positions
+'''
+def compile_select_relop_expr(expr, table):
+    attr_index, condition, constants = translate_select_relop_expr(expr, table)
+    if isinstance(table.columns[attr_index], encoding.EncodedColumn):
+        row_filter = encoding.compile_select_filter(attr_index, condition, constants, expr)
+        return metrics.counted_select_filter(row_filter) if metrics.enabled() else row_filter
+    if vectorized.enabled() and vectorized.as_numpy(table.columns[attr_index]) is not None \
+            and all(not isinstance(constant, str) for constant in constants.values()):
+        row_filter = vectorized.compile_select_filter(attr_index, condition, constants, expr)
+        return metrics.counted_select_filter(row_filter) if metrics.enabled() else row_filter
+    source = (
+        "def row_filter(table, row_ids=None):\n"
+        "    column = table.columns[{0}]\n"
+        "    if row_ids is None:\n"
+        "        return [i for i, v in enumerate(column) if {1}]\n"
+        "    return [i for i, v in zip(row_ids, map(column.__getitem__, row_ids)) if {1}]\n"
+    ).format(attr_index, condition)
+    namespace = dict(constants)
+    exec(compile(source, "<select {0}>".format(expr), "exec"), namespace)
+    if metrics.enabled():
+        return metrics.counted_select_filter(namespace["row_filter"])
+    return namespace["row_filter"]
 
 '''
 Method which gets the attribute value of the equality condition inside select operation
@@ -287,6 +535,38 @@ def get_select_equal_relop_attr_value(relop_expr):
             attr = relop_expr[2]
     return attr, value
 
+'''
+Relop of the mirrored condition, used to put the attribute on the left side (e.g 30 < qty is qty > 30)
+'''
+MIRRORED_RELOP = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+'''
+Method which gets the range of attribute values satisfying an inequality condition inside select operation
+Parameters: relop_expr - parsed inequality condition
+Return: attribute name and its KeyRange, None if the condition does not compare an attribute to a constant
+'''
+def get_select_range_relop_attr_range(relop_expr):
+    if is_const(relop_expr[2]) and not is_const(relop_expr[0]) and not is_arithop_expr(relop_expr[0]):
+        # Deal with expression like time > 50
+        attr, operator, constant = relop_expr
+    elif is_const(relop_expr[0]) and not is_const(relop_expr[2]) and not is_arithop_expr(relop_expr[2]):
+        # Deal with expression like 50 < time
+        constant, operator, attr = relop_expr
+        operator = MIRRORED_RELOP[operator]
+    else:
+        return None
+    if is_num(constant):
+        value = get_number(constant)
+    else:
+        value = get_str(constant)
+    if operator == ">":
+        return attr, KeyRange(value, None, True, False)
+    if operator == ">=":
+        return attr, KeyRange(value, None, False, False)
+    if operator == "<":
+        return attr, KeyRange(None, value, False, True)
+    return attr, KeyRange(None, value, False, False)
+
 
 '''
 Method which parses attribute string for join operation (e.g R.customerid)
@@ -298,42 +578,116 @@ def parse_attr(s):
     return match[1].strip(), match[2].strip()
 
 '''
-Method which evaluates arithop expression inside join operation
-Parameters: expr - arithop expression that needs to be evaluated
-Return: lambda function that evaluates arithop expression
+Method which parses the attributes of sort/topk operations
+Parameters: params - attributes, each optionally followed by asc or desc (e.g qty desc), and an optional last
+                     parameter limiting the number of result rows (e.g limit 100)
+Return: attribute names, descending flags of the attributes and the limit (None if not given)
+'''
+def parse_sort_params(params):
+    limit = None
+    match = re.match(r"^limit\s+([0-9]+)$", params[-1]) if params else None
+    if match:
+        limit = int(match[1])
+        params = params[:-1]
+    attrs = []
+    descending = []
+    for param in params:
+        words = param.split()
+        if len(words) == 2 and words[1].lower() in ("asc", "desc"):
+            attrs.append(words[0])
+            descending.append(words[1].lower() == "desc")
+        else:
+            attrs.append(param)
+            descending.append(False)
+    return attrs, descending, limit
+
 '''
-def evaluate_join_arithop_expr(expr):
-    arithop_expr = parse_arithop_expr(expr)
-    attr = parse_attr(arithop_expr[0])[1]
-    arithop_eval = lambda table, record: evaluate_arithop(record[table.get_attr_index(attr)], arithop_expr[1], arithop_expr[2])
-    return arithop_eval
+Method which translates one side of a condition inside join operation into Python source
+Parameters: s - attribute (e.g R.qty) or arithop expression (e.g R.qty * 5)
+            table - table the attribute belongs to
+            value_format - format of the source of the attribute value, given the attribute index
+            constants - dictionary of the names bound so far
+Return: index of the attribute and source of the expression
+'''
+def translate_join_operand(s, table, value_format, constants):
+    if is_arithop_expr(s):
+        # Deal with expression like R.qty * 5
+        arithop_expr = parse_arithop_expr(s)
+        attr_index = resolve_attr_index(table, parse_attr(arithop_expr[0])[1])
+        value = value_format.format(attr_index)
+        return attr_index, translate_arithop(value, arithop_expr[1], arithop_expr[2], table.columns[attr_index], constants)
+    # Deal with expression like R.qty
+    attr_index = resolve_attr_index(table, parse_attr(s)[1])
+    return attr_index, value_format.format(attr_index)
 
 '''
-Method which evaluates condition (relop expression) inside join operation
-Parameters: expr - condition expression that needs to be evaluated
-Return: lambda function that evaluates condition expression
+Method which compiles condition (relop expression) inside join operation
+Parameters: expr - condition expression that needs to be compiled
+            table1 - table of the left side of the condition
+            table2 - table of the right side of the condition
+Return: function (record1, record2) that evaluates the condition on a record of each table
 '''
-def evaluate_join_relop_expr(expr):
+def compile_join_relop_expr(expr, table1, table2):
     relop_expr = parse_relop_expr(expr)
-    operator = relop_expr[1]
-    if is_arithop_expr(relop_expr[0]):
-        arithop_eval1 = evaluate_join_arithop_expr(relop_expr[0])
-        if is_arithop_expr(relop_expr[2]):
-            # Deal with expression like R.qty * 5 > S.Q * 3
-            arithop_eval2 = evaluate_join_arithop_expr(relop_expr[2])
-            relop_eval = lambda table1, record1, table2, record2: evaluate_relop(arithop_eval1(table1, record1), operator, arithop_eval2(table2, record2))
-        else:
-            # Deal with expression like R.qty * 5 > S.Q
-            attr = parse_attr(relop_expr[2])[1]
-            relop_eval = lambda table1, record1, table2, record2: evaluate_relop(arithop_eval1(table1, record1), operator, record2[table2.get_attr_index(attr)])
-    else:
-        attr1 = parse_attr(relop_expr[0])[1]
-        if is_arithop_expr(relop_expr[2]):
-            # Deal with expression like R.qty > S.Q * 3
-            arithop_eval2 = evaluate_join_arithop_expr(relop_expr[2])
-            relop_eval = lambda table1, record1, table2, record2: evaluate_relop(record1[table1.get_attr_index(attr1)], operator, arithop_eval2(table2, record2))
-        else:
-            # Deal with expression like R.qty > S.Q
-            attr2 = parse_attr(relop_expr[2])[1]
-            relop_eval = lambda table1, record1, table2, record2: evaluate_relop(record1[table1.get_attr_index(attr1)], operator, record2[table2.get_attr_index(attr2)])
-    return relop_eval
\ No newline at end of file
+    constants = {}
+    left = translate_join_operand(relop_expr[0], table1, "record1[{0}]", constants)[1]
+    right = translate_join_operand(relop_expr[2], table2, "record2[{0}]", constants)[1]
+    source = "lambda record1, record2: {0} {1} {2}".format(left, RELOP_SOURCE[relop_expr[1]], right)
+    condition = eval(compile(source, "<join {0}>".format(expr), "eval"), dict(constants))
+    return metrics.counted_condition(condition) if metrics.enabled() else condition
+
+'''
+Method which compiles condition (relop expression) inside join operation into a filter of candidate row pairs
+Parameters: expr - condition expression that needs to be compiled
+            table1 - table of the left side of the condition
+            table2 - table of the right side of the condition
+Return: function (table1, table2, pairs) returning the (row of table1, row of table2) pairs satisfying the condition
+'''
+def compile_join_pair_filter(expr, table1, table2):
+    relop_expr = parse_relop_expr(expr)
+    constants = {}
+    left = translate_join_operand(relop_expr[0], table1, "columns1[{0}][i]", constants)[1]
+    right = translate_join_operand(relop_expr[2], table2, "columns2[{0}][j]", constants)[1]
+    source = (
+        "def pair_filter(table1, table2, pairs):\n"
+        "    columns1 = table1.columns\n"
+        "    columns2 = table2.columns\n"
+        "    return [(i, j) for i, j in pairs if {0} {1} {2}]\n"
+    ).format(left, RELOP_SOURCE[relop_expr[1]], right)
+    namespace = dict(constants)
+    exec(compile(source, "<join {0}>".format(expr), "exec"), namespace)
+    if metrics.enabled():
+        return metrics.counted_pair_filter(namespace["pair_filter"])
+    return namespace["pair_filter"]
+
+'''
+Method which compiles one side of an equality condition inside join operation into a join key extractor
+Parameters: s - attribute (e.g R.customerid) or arithop expression (e.g R.qty * 5)
+            table - table the attribute belongs to
+Return: function (table) returning the join key of every row of the table
+'''
+def compile_join_key_expr(s, table):
+    constants = {}
+    attr_index, key = translate_join_operand(s, table, "v", constants)
+    if key == "v":
+        return lambda table: table.columns[attr_index]
+    source = "lambda table: [{0} for v in table.columns[{1}]]".format(key, attr_index)
+    return eval(compile(source, "<join key {0}>".format(s), "eval"), dict(constants))
+
+'''
+Method which compiles both sides of an equality condition inside join operation into join key extractors
+Attributes encoded on both sides are joined on codes, those of the second table translated to the dictionary of the first
+Parameters: expr - equality condition (e.g R.customerid = S.customerid)
+            table1 - the first table of the join
+            table2 - the second table of the join
+Return: functions (table) returning the join key of every row of the first and of the second table
+'''
+def compile_join_key_exprs(expr, table1, table2):
+    relop_expr = parse_relop_expr(expr)
+    attr_index1, key1 = translate_join_operand(relop_expr[0], table1, "v", {})
+    attr_index2, key2 = translate_join_operand(relop_expr[2], table2, "v", {})
+    column1, column2 = table1.columns[attr_index1], table2.columns[attr_index2]
+    if key1 == key2 == "v" and isinstance(column1, encoding.EncodedColumn) and isinstance(column2, encoding.EncodedColumn):
+        return (lambda table: table.columns[attr_index1].codes,
+                lambda table: encoding.join_key_codes(table.columns[attr_index2], column1))
+    return compile_join_key_expr(relop_expr[0], table1), compile_join_key_expr(relop_expr[2], table2)
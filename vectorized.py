@@ -0,0 +1,185 @@
+from array import array
+import config
+import encoding
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+'''
+NumPy execution backend, used when config.EXECUTION_MODE is "numpy"
+Only integer/float columns (typed arrays) are vectorized; every method returns None or the caller keeps the
+pure-Python path when a column cannot be handled with results identical to it
+'''
+
+'''
+Method which checks whether the NumPy backend is selected
+Return: boolean value
+'''
+def enabled():
+    return np is not None and config.EXECUTION_MODE == "numpy"
+
+'''
+Method which checks whether row positions are a NumPy array (typed arrays and lists are gathered without NumPy)
+Parameters: row_ids - row positions
+Return: boolean value
+'''
+def is_numpy_array(row_ids):
+    return np is not None and isinstance(row_ids, np.ndarray)
+
+'''
+NumPy types of the codes of encoded columns
+'''
+CODE_DTYPES = {"B": "uint8", "H": "uint16", "I": "uint32"}
+
+'''
+Method which wraps a typed column as a NumPy array without copying it
+Parameters: column - typed array or list of attribute values (or the codes of an encoded column)
+Return: NumPy array sharing the memory of the column, None for list columns
+'''
+def as_numpy(column):
+    if isinstance(column, array):
+        if column.typecode == "q":
+            return np.frombuffer(column, dtype=np.int64) if len(column) else np.zeros(0, dtype=np.int64)
+        if column.typecode == "d":
+            return np.frombuffer(column, dtype=np.float64) if len(column) else np.zeros(0, dtype=np.float64)
+        if column.typecode in CODE_DTYPES:
+            return np.frombuffer(column, dtype=CODE_DTYPES[column.typecode]) if len(column) else np.zeros(0, dtype=CODE_DTYPES[column.typecode])
+    return None
+
+'''
+Method which checks whether the sums over an integer array fit into 64 bits, so that NumPy gives exact results
+Parameters: values - integer NumPy array
+Return: boolean value
+'''
+def sums_fit(values):
+    return len(values) == 0 or int(np.abs(values).max()) * len(values) < 2 ** 63
+
+'''
+Method which compiles condition source (on the attribute value "v") into a mask-based filter
+Parameters: attr_index - index of the attribute used by the condition
+            condition - source of the condition
+            constants - constants used by the source
+            expr - original condition expression
+Return: function (table, row_ids=None) returning the row positions satisfying the condition
+'''
+def compile_select_filter(attr_index, condition, constants, expr):
+    code = compile(condition, "<select {0}>".format(expr), "eval")
+    def row_filter(table, row_ids=None):
+        values = as_numpy(table.columns[attr_index])
+        if row_ids is None:
+            return np.flatnonzero(eval(code, constants, {"v": values}))
+        row_ids = np.asarray(row_ids, dtype=np.intp)
+        return row_ids[eval(code, constants, {"v": values[row_ids]})]
+    return row_filter
+
+'''
+Method which merges row positions of several conditions (used by select with "or")
+Parameters: row_ids_list - row positions satisfying each condition
+            searched_row_ids - row positions the conditions were checked on, None for the whole table
+Return: row positions satisfying any condition, sorted or in the order of searched_row_ids
+'''
+def union_row_ids(row_ids_list, searched_row_ids=None):
+    result = np.zeros(0, dtype=np.intp)
+    for row_ids in row_ids_list:
+        result = np.union1d(result, np.asarray(row_ids, dtype=np.intp))
+    if searched_row_ids is not None:
+        searched_row_ids = np.asarray(searched_row_ids, dtype=np.intp)
+        return searched_row_ids[np.isin(searched_row_ids, result)]
+    return result
+
+'''
+Method which gathers the values of a column at the given row positions
+Parameters: column - typed array, list of attribute values or encoded column
+            row_ids - row positions that need to be gathered
+Return: a new column of the same kind containing the gathered values
+'''
+def take_column(column, row_ids):
+    if isinstance(column, encoding.EncodedColumn):
+        return encoding.EncodedColumn(take_column(column.codes, row_ids), column.values)
+    row_ids = np.asarray(row_ids, dtype=np.intp)
+    values = as_numpy(column)
+    if values is None:
+        return [column[i] for i in row_ids.tolist()]
+    result = array(column.typecode)
+    result.frombytes(values[row_ids].tobytes())
+    return result
+
+'''
+Method which calculates the sum of an integer column
+Parameters: column - typed array or list of attribute values
+Return: the sum, None if the column is not handled by the backend
+'''
+def column_sum(column):
+    values = as_numpy(column)
+    if values is None or values.dtype != np.int64 or not sums_fit(values):
+        return None
+    return int(values.sum())
+
+'''
+Method which assigns every row to a group, numbering groups in order of their first row
+Parameters: columns - columns of the group attributes
+Return: group number of every row, first row of every group and number of groups
+'''
+def group_rows(columns):
+    codes = None
+    for column in columns:
+        values = as_numpy(column)
+        if values is not None and values.dtype.kind in "iu":
+            column_codes = np.unique(values, return_inverse=True)[1].reshape(-1)
+        else:
+            # Strings and floats are grouped with Python equality, as in the Python path
+            group_map = {}
+            column_codes = np.fromiter((group_map.setdefault(value, len(group_map)) for value in column), dtype=np.int64, count=len(column))
+        if codes is None:
+            codes = column_codes
+        else:
+            codes = np.unique(codes * (int(column_codes.max()) + 1) + column_codes, return_inverse=True)[1].reshape(-1)
+    first_rows, inverse = np.unique(codes, return_index=True, return_inverse=True)[1:]
+    order = np.argsort(first_rows)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.reshape(-1)], first_rows[order], len(order)
+
+'''
+Method which calculates sum/count of a column for every group
+Parameters: sum_column - column of the attribute that needs to be summed, None to only count rows
+            group_columns - columns of the group attributes
+Return: group keys (in order of their first row), sums and counts of every group, None if not handled by the backend
+'''
+def group_aggregate(sum_column, group_columns):
+    if not group_columns or len(group_columns[0]) == 0:
+        return None
+    sums = None
+    if sum_column is not None:
+        values = as_numpy(sum_column)
+        if values is None or values.dtype != np.int64 or not sums_fit(values):
+            return None
+    groups, first_rows, num_groups = group_rows(group_columns)
+    counts = np.bincount(groups, minlength=num_groups).tolist()
+    if sum_column is not None:
+        sums = np.zeros(num_groups, dtype=np.int64)
+        np.add.at(sums, groups, values)
+        sums = sums.tolist()
+    first_rows = first_rows.tolist()
+    keys = list(zip(*[[column[i] for i in first_rows] for column in group_columns]))
+    return keys, sums, counts
+
+'''
+Method which calculates moving sums/averages of an integer column with cumulative sums
+Parameters: column - typed array or list of attribute values
+            window - size of the moving window
+            avg - operation indicator: movsum/movavg
+Return: the new column, None if not handled by the backend
+'''
+def moving_sum(column, window, avg=False):
+    values = as_numpy(column)
+    if values is None or values.dtype != np.int64 or window < 1 or not sums_fit(values):
+        return None
+    cumsum = np.concatenate((np.zeros(1, dtype=np.int64), np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    sums = cumsum[ends] - cumsum[starts]
+    if avg:
+        return array("d", (sums / (ends - starts)).tobytes())
+    return array("q", sums.tobytes())